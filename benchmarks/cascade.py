@@ -0,0 +1,106 @@
+"""Tempo e número de comandos para deletar uma romancista prolífica.
+
+Popula uma única romancista com N livros, lê parte deles para o cache e
+mede DELETE /romancista/1 no app em processo, contando comandos SQL e
+chaves escritas no cache (ambos constantes em N). Exemplo:
+
+    python -m benchmarks.cascade --livros 100000 --database postgres
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.harness import (
+    Catalog,
+    configure_environment,
+    database,
+    login_tokens,
+    seed,
+)
+
+
+class CacheWrites:
+    def __init__(self, backend):
+        self.backend = backend
+        self.keys = 0
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    async def hold(self, keys, seconds):
+        self.keys += len(keys)
+        await self.backend.hold(keys, seconds)
+
+    async def delete(self, *keys):
+        self.keys += len(keys)
+        await self.backend.delete(*keys)
+
+    async def mark(self, key, seconds):
+        self.keys += 1
+        await self.backend.mark(key, seconds)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--database', choices=['sqlite', 'postgres'], default='sqlite'
+    )
+    parser.add_argument('--livros', type=int, default=100_000)
+    parser.add_argument(
+        '--cached',
+        type=int,
+        default=1_000,
+        help='Livros lidos antes, para estarem no cache ao deletar.',
+    )
+    return parser.parse_args(argv)
+
+
+async def benchmark(args) -> dict:
+    import httpx
+
+    from madr.app import app
+    from madr.cache import entity_cache
+    from madr.database import QueryCounter, get_engine
+
+    await seed(1, 1, args.livros)
+    catalog = Catalog(1, 1, args.livros)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url='http://madr'
+    ) as client:
+        await login_tokens(client, catalog, count=1)
+        for livro_id in range(1, min(args.livros, args.cached) + 1):
+            await client.get(f'/livro/{livro_id}')
+        cache = entity_cache.backend = CacheWrites(entity_cache.backend)
+
+        with QueryCounter(get_engine()) as queries:
+            start = time.perf_counter()
+            response = await client.delete(
+                '/romancista/1',
+                headers={'Authorization': f'Bearer {catalog.tokens[0]}'},
+            )
+            elapsed = time.perf_counter() - start
+
+    response.raise_for_status()
+
+    return {
+        'livros': args.livros,
+        'duration_ms': round(elapsed * 1000, 2),
+        'statements': queries.count,
+        'cache_keys_written': cache.keys,
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with database(args.database) as database_url:
+        configure_environment(database_url)
+        print(json.dumps(asyncio.run(benchmark(args))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Memória de pico ao exportar o catálogo inteiro.
+
+Popula N livros e consome o corpo de GET /livro/export direto do
+StreamingResponse, descartando cada pedaço, para medir quanto o RSS do
+processo cresce durante a exportação. Com o streaming por partições o
+crescimento fica constante, seja qual for o tamanho da tabela.
+Exemplo:
+
+    python -m benchmarks.export --livros 1000000 --formato csv
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import resource
+import sys
+import time
+
+from benchmarks.harness import configure_environment, database, seed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--database', choices=['sqlite', 'postgres'], default='sqlite'
+    )
+    parser.add_argument('--livros', type=int, default=1_000_000)
+    parser.add_argument(
+        '--formato', choices=['ndjson', 'csv'], default='ndjson'
+    )
+    parser.add_argument(
+        '--max-rss-mib',
+        type=float,
+        default=None,
+        help='Falha se o RSS crescer mais do que isso durante a exportação.',
+    )
+    return parser.parse_args(argv)
+
+
+def rss_mib() -> float:
+    try:
+        with open('/proc/self/statm', encoding='ascii') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize() / 1024 / 1024
+    except OSError:
+        # Sem /proc (macOS), fica o pico do processo, em bytes.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024
+
+
+async def benchmark(args) -> dict:
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from madr.database import get_engine
+    from madr.export import export_response
+    from madr.routers.livro import LIVRO_COLUMNS
+
+    await seed(1, 100, args.livros)
+    gc.collect()
+
+    baseline = peak = rss_mib()
+    rows = size = 0
+    start = time.perf_counter()
+
+    session = AsyncSession(get_engine())
+    response = export_response(
+        session, select(*LIVRO_COLUMNS), args.formato, 'livros'
+    )
+    async for chunk in response.body_iterator:
+        rows += chunk.count('\n')
+        size += len(chunk)
+        peak = max(peak, rss_mib())
+
+    elapsed = time.perf_counter() - start
+
+    return {
+        'livros': args.livros,
+        'formato': args.formato,
+        'rows': rows,
+        'mib': round(size / 1024 / 1024, 1),
+        'duration_s': round(elapsed, 2),
+        'rss_before_mib': round(baseline, 1),
+        'rss_growth_mib': round(peak - baseline, 1),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with database(args.database) as database_url:
+        configure_environment(database_url)
+        result = asyncio.run(benchmark(args))
+
+    print(json.dumps(result))
+
+    if args.max_rss_mib is not None and (
+        result['rss_growth_mib'] > args.max_rss_mib
+    ):
+        sys.exit(f'RSS cresceu {result["rss_growth_mib"]} MiB na exportação')
+
+
+if __name__ == '__main__':
+    main()
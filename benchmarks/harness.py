@@ -0,0 +1,362 @@
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http import HTTPStatus
+
+BENCH_ENV = {
+    'SECRET_KEY': 'benchmark-secret',
+    'ALGORITHM': 'HS256',
+    'ACCESS_TOKEN_EXPIRE_MINUTES': '60',
+}
+PASSWORD = 'benchmark'
+
+
+@contextmanager
+def database(kind: str):
+    if kind == 'postgres':
+        from testcontainers.postgres import PostgresContainer
+
+        with PostgresContainer('postgres:16', driver='psycopg') as postgres:
+            yield postgres.get_connection_url()
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        yield f'sqlite+aiosqlite:///{directory}/madr.db'
+
+
+def configure_environment(database_url: str, overrides: dict | None = None):
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ['DATABASE_URL'] = database_url
+    for key, value in (overrides or {}).items():
+        os.environ[key] = str(value)
+
+
+async def seed(contas: int, romancistas: int, livros: int, chunk=5_000):
+    from sqlalchemy import insert
+
+    from madr.database import get_engine
+    from madr.models import (
+        Conta,
+        Livro,
+        Romancista,
+        table_registry,
+    )
+    from madr.security import get_password_hash
+    from madr.stats import recalcula_estatisticas
+
+    rng = random.Random(42)
+    password = get_password_hash(PASSWORD)
+
+    async with get_engine().begin() as conn:
+        await conn.run_sync(table_registry.metadata.drop_all)
+        await conn.run_sync(table_registry.metadata.create_all)
+
+        await conn.execute(
+            insert(Conta),
+            [
+                {
+                    'username': f'conta{i}',
+                    'email': f'conta{i}@madr.dev',
+                    'password': password,
+                }
+                for i in range(1, contas + 1)
+            ],
+        )
+        await conn.execute(
+            insert(Romancista),
+            [{'nome': f'romancista {i}'} for i in range(1, romancistas + 1)],
+        )
+        for start in range(1, livros + 1, chunk):
+            await conn.execute(
+                insert(Livro),
+                [
+                    {
+                        'ano': rng.randint(1800, 2024),
+                        'titulo': f'livro {i}',
+                        'romancista_id': rng.randint(1, romancistas),
+                    }
+                    for i in range(start, min(start + chunk, livros + 1))
+                ],
+            )
+
+        await recalcula_estatisticas(conn)
+
+
+@dataclass
+class Catalog:
+    contas: int
+    romancistas: int
+    livros: int
+    tokens: list[str] = field(default_factory=list)
+    created: int = 0
+    bulk_size: int = 500
+
+
+def _auth(catalog: Catalog, rng: random.Random):
+    return {'Authorization': f'Bearer {rng.choice(catalog.tokens)}'}
+
+
+def _random_cursor(catalog: Catalog, rng: random.Random) -> str:
+    from madr.helpers import encode_cursor
+
+    return encode_cursor(rng.randint(0, catalog.livros - 50))
+
+
+SCENARIOS = {
+    'login': lambda c, rng: (
+        'POST',
+        '/auth/token',
+        {
+            'data': {
+                'username': f'conta{rng.randint(1, c.contas)}@madr.dev',
+                'password': PASSWORD,
+            }
+        },
+    ),
+    'search': lambda c, rng: (
+        'GET',
+        f'/livro/?titulo=livro {rng.randint(100, 999)}',
+        {},
+    ),
+    'list': lambda c, rng: ('GET', '/livro/?limit=20', {}),
+    'get_livro': lambda c, rng: (
+        'GET',
+        f'/livro/{rng.randint(1, c.livros)}',
+        {},
+    ),
+    'get_romancista': lambda c, rng: (
+        'GET',
+        f'/romancista/{rng.randint(1, c.romancistas)}',
+        {},
+    ),
+    'deep_offset': lambda c, rng: (
+        'GET',
+        f'/livro/?limit=50&offset={rng.randint(0, c.livros - 50)}',
+        {},
+    ),
+    'deep_cursor': lambda c, rng: (
+        'GET',
+        f'/livro/?limit=50&cursor={_random_cursor(c, rng)}',
+        {},
+    ),
+    'export': lambda c, rng: (
+        'GET',
+        f'/livro/export?formato={rng.choice(["ndjson", "csv"])}',
+        {},
+    ),
+    'stats': lambda c, rng: ('GET', '/stats', {}),
+    'stats_anos': lambda c, rng: ('GET', '/stats/anos', {}),
+    'romancistas_totais': lambda c, rng: (
+        'GET',
+        f'/romancista/?totais=true&limit=20'
+        f'&offset={rng.randint(0, max(c.romancistas - 20, 0))}',
+        {},
+    ),
+    'create': lambda c, rng: (
+        'POST',
+        '/livro/',
+        {
+            'json': {
+                'ano': rng.randint(1800, 2024),
+                'titulo': f'novo {rng.random()}',
+                'romancista_id': rng.randint(1, c.romancistas),
+            },
+            'headers': _auth(c, rng),
+        },
+    ),
+    'bulk': lambda c, rng: (
+        'POST',
+        '/livro/bulk',
+        {
+            'json': [
+                {
+                    'ano': rng.randint(1800, 2024),
+                    'titulo': f'lote {rng.random()} {i}',
+                    'romancista_id': rng.randint(1, c.romancistas),
+                }
+                for i in range(c.bulk_size)
+            ],
+            'headers': _auth(c, rng),
+        },
+    ),
+    'patch': lambda c, rng: (
+        'PATCH',
+        f'/livro/{rng.randint(1, c.livros)}',
+        {
+            'json': {
+                'ano': rng.randint(1800, 2024),
+                'titulo': f'editado {rng.random()}',
+                'romancista_id': rng.randint(1, c.romancistas),
+            },
+            'headers': _auth(c, rng),
+        },
+    ),
+}
+
+MIXES = {
+    'default': {
+        'login': 1,
+        'search': 3,
+        'list': 2,
+        'get_livro': 10,
+        'get_romancista': 3,
+        'create': 1,
+        'patch': 1,
+    },
+    'read': {'search': 2, 'list': 2, 'get_livro': 10, 'get_romancista': 4},
+    'write': {'create': 1, 'patch': 1},
+    'login_storm': {'login': 4, 'list': 1},
+    'pagination': {'deep_offset': 1, 'deep_cursor': 1},
+    'stats': {'stats': 1, 'stats_anos': 1, 'romancistas_totais': 1},
+    'export': {'export': 1, 'get_livro': 20},
+    'bulk': {'bulk': 1},
+}
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    return {
+        'count': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3)
+        if latencies
+        else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def measure_loop_lag(samples: list[float], interval=0.01):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - start - interval))
+
+
+async def drive(client, catalog: Catalog, args):
+    mix = MIXES[args.mix]
+    rng = random.Random(args.seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    plan = rng.choices(names, weights=weights, k=args.requests)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    queue = iter(enumerate(plan))
+
+    async def worker():
+        for index, name in queue:
+            method, url, kwargs = SCENARIOS[name](
+                catalog, random.Random(index)
+            )
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies[name].append(time.perf_counter() - start)
+            if response.status_code >= HTTPStatus.BAD_REQUEST:
+                errors[name] += 1
+
+    lag = []
+    lag_task = asyncio.create_task(measure_loop_lag(lag))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    lag_task.cancel()
+
+    every = [value for values in latencies.values() for value in values]
+    endpoints = {
+        name: summarize(latencies[name], errors[name], elapsed)
+        for name in sorted(latencies)
+    }
+    if 'bulk' in endpoints:
+        lotes = len(latencies['bulk']) - errors['bulk']
+        endpoints['bulk']['rows_per_s'] = round(
+            lotes * catalog.bulk_size / elapsed, 1
+        )
+
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'overall': summarize(every, sum(errors.values()), elapsed),
+        'endpoints': endpoints,
+        'client_loop_lag': summarize(lag, 0, elapsed),
+    }
+
+
+async def login_tokens(client, catalog: Catalog, count=4):
+    for i in range(1, min(count, catalog.contas) + 1):
+        response = await client.post(
+            '/auth/token',
+            data={'username': f'conta{i}@madr.dev', 'password': PASSWORD},
+        )
+        catalog.tokens.append(response.json()['access_token'])
+
+
+def server_environment(port: int, workers: int) -> dict:
+    env = os.environ.copy()
+    env.update({
+        'SERVER_HOST': '127.0.0.1',
+        'SERVER_PORT': str(port),
+        'SERVER_WORKERS': str(workers),
+    })
+    if workers > 1 and not env.get('CACHE_URL'):
+        # Sem cache compartilhado, vários workers exigem o cache desligado;
+        # cache_config() registra isso no resultado.
+        env['CACHE_SIZE'] = '0'
+    return env
+
+
+def cache_config(env: dict) -> dict:
+    from madr.settings import Settings
+
+    size = env.get('CACHE_SIZE', Settings.model_fields['CACHE_SIZE'].default)
+    return {
+        'backend': 'redis' if env.get('CACHE_URL') else 'memory',
+        'size': int(size),
+    }
+
+
+@contextmanager
+def uvicorn_server(env: dict):
+    with tempfile.TemporaryDirectory(prefix='madr_metrics_') as metrics_dir:
+        if int(env['SERVER_WORKERS']) > 1:
+            # Os workers somam as métricas por snapshots nesse diretório.
+            env = {'METRICS_DIR': metrics_dir, **env}
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'madr.server'], env=env
+        )
+        try:
+            yield f'http://{env["SERVER_HOST"]}:{env["SERVER_PORT"]}'
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+async def wait_until_ready(client, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            response = await client.get('/health/ready')
+            if response.status_code == HTTPStatus.OK:
+                return
+        except Exception:
+            if time.perf_counter() > deadline:
+                raise
+        if time.perf_counter() > deadline:
+            raise TimeoutError('servidor não ficou pronto')
+        await asyncio.sleep(0.2)
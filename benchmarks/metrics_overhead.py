@@ -0,0 +1,125 @@
+"""Custo das métricas no caminho quente.
+
+Roda a mesma mistura de requisições no app em processo com
+METRICS_ENABLED ligado e desligado, alternando a ordem das rodadas
+para diluir ruído, e mede à parte o custo por requisição das
+operações de métrica (inc/observe) que o middleware faz. Exemplo:
+
+    python -m benchmarks.metrics_overhead --mix read --rounds 4
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from benchmarks.harness import (
+    MIXES,
+    Catalog,
+    configure_environment,
+    database,
+    drive,
+    seed,
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--database', choices=['sqlite', 'postgres'], default='sqlite'
+    )
+    parser.add_argument('--mix', choices=sorted(MIXES), default='read')
+    parser.add_argument('--romancistas', type=int, default=1_000)
+    parser.add_argument('--livros', type=int, default=20_000)
+    parser.add_argument('--requests', type=int, default=2_000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--iterations', type=int, default=200_000)
+    return parser.parse_args(argv)
+
+
+def metric_ops_cost(iterations: int) -> float:
+    from madr.metrics import (
+        Counter,
+        Gauge,
+        Histogram,
+        Registry,
+    )
+
+    registry = Registry()
+    requests = registry.register(
+        Counter('requests_total', '', ('method', 'route', 'status'))
+    )
+    duration = registry.register(
+        Histogram('duration', '', ('method', 'route'))
+    )
+    in_flight = registry.register(Gauge('in_flight', ''))
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        in_flight.inc()
+        in_flight.dec()
+        requests.inc('GET', '/livro/{livro_id}', 200)
+        duration.observe(i % 100 / 1000, 'GET', '/livro/{livro_id}')
+    return (time.perf_counter() - start) / iterations
+
+
+def summary(runs: list[dict]) -> dict:
+    return {
+        'rps': round(statistics.median(r['overall']['rps'] for r in runs), 2),
+        'p50_ms': round(
+            statistics.median(r['overall']['p50_ms'] for r in runs), 3
+        ),
+        'p99_ms': round(
+            statistics.median(r['overall']['p99_ms'] for r in runs), 3
+        ),
+    }
+
+
+async def benchmark(args) -> dict:
+    import httpx
+
+    from madr import app as app_module
+
+    await seed(1, args.romancistas, args.livros)
+    catalog = Catalog(1, args.romancistas, args.livros)
+
+    runs = {True: [], False: []}
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url='http://madr'
+    ) as client:
+        await drive(client, catalog, args)
+        for round_ in range(args.rounds):
+            # A primeira rodada de cada par sai mais lenta; alternar a
+            # ordem evita atribuir esse efeito às métricas.
+            order = (True, False) if round_ % 2 == 0 else (False, True)
+            for enabled in order:
+                app_module.settings.METRICS_ENABLED = enabled
+                runs[enabled].append(await drive(client, catalog, args))
+
+    ligadas, desligadas = summary(runs[True]), summary(runs[False])
+    return {
+        'metrics_on': ligadas,
+        'metrics_off': desligadas,
+        'rps_overhead_pct': round(
+            (desligadas['rps'] - ligadas['rps']) / desligadas['rps'] * 100, 2
+        ),
+        'metric_ops_us_per_request': round(
+            metric_ops_cost(args.iterations) * 1_000_000, 3
+        ),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with database(args.database) as database_url:
+        configure_environment(database_url)
+        print(json.dumps(asyncio.run(benchmark(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Custo de CPU e alocação por requisição das listagens.
+
+Compara o caminho padrão (response_model + json da stdlib) com o
+caminho rápido (FAST_JSON=true + orjson) em páginas de 10, 100 e 1000
+livros, no app em processo. O pico de memória alocada por requisição
+vem do tracemalloc; rode em commits diferentes para comparar a
+hidratação de entidades com a projeção de colunas. Exemplo:
+
+    python -m benchmarks.pages --sizes 10 100 1000 --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from benchmarks.harness import configure_environment, database, seed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--database', choices=['sqlite', 'postgres'], default='sqlite'
+    )
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[10, 100, 1000]
+    )
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--livros', type=int, default=5_000)
+    parser.add_argument('--path', default='/livro/')
+    return parser.parse_args(argv)
+
+
+async def measure(client, path: str, size: int, requests: int) -> dict:
+    url = f'{path}?limit={size}'
+    await client.get(url)
+
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(url)
+        response.raise_for_status()
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+
+    tracemalloc.start()
+    await client.get(url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'cpu_ms_per_request': round(cpu / requests * 1000, 3),
+        'wall_ms_per_request': round(wall / requests * 1000, 3),
+        'peak_kib_per_request': round(peak / 1024, 1),
+        'bytes': len(response.content),
+    }
+
+
+async def benchmark(args) -> list[dict]:
+    import httpx
+
+    from madr.app import app
+    from madr.routers import livro, romancista
+
+    await seed(1, 100, args.livros)
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url='http://madr'
+    ) as client:
+        for fast in (False, True):
+            livro.settings.FAST_JSON = fast
+            romancista.settings.FAST_JSON = fast
+            for size in args.sizes:
+                stats = await measure(client, args.path, size, args.requests)
+                results.append({'fast_json': fast, 'size': size, **stats})
+
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with database(args.database) as database_url:
+        configure_environment(database_url)
+        results = asyncio.run(benchmark(args))
+
+    for result in results:
+        print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""Benchmark harness da API MADR.
+
+Popula o banco com contas, romancistas e livros e dispara uma mistura
+de requisições contra o app em processo (httpx + ASGITransport) ou
+contra um servidor uvicorn. Exemplos:
+
+    python -m benchmarks.run --mix default --requests 5000
+    python -m benchmarks.run --database postgres --server uvicorn
+    python -m benchmarks.run --server uvicorn --workers 1 2 4
+    python -m benchmarks.run --mix bulk --bulk-size 1000
+    python -m benchmarks.run --mix login_storm --output atual.json \\
+        --compare anterior.json
+
+Medições que não cabem numa mistura de requisições têm script próprio:
+
+    python -m benchmarks.tokens            # validação de token fria x quente
+    python -m benchmarks.export            # RSS ao exportar 1 milhão de livros
+    python -m benchmarks.metrics_overhead  # custo das métricas, ligadas x não
+    python -m benchmarks.pages             # CPU e memória por página
+    python -m benchmarks.cascade           # deleção de romancista prolífica
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.harness import (
+    MIXES,
+    Catalog,
+    cache_config,
+    configure_environment,
+    database,
+    drive,
+    login_tokens,
+    seed,
+    server_environment,
+    uvicorn_server,
+    wait_until_ready,
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--database', choices=['sqlite', 'postgres'], default='sqlite'
+    )
+    parser.add_argument(
+        '--server', choices=['inprocess', 'uvicorn'], default='inprocess'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        nargs='+',
+        default=[1],
+        help='Com mais de um valor, mede a escala por número de workers.',
+    )
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--mix', choices=sorted(MIXES), default='default')
+    parser.add_argument('--contas', type=int, default=50)
+    parser.add_argument('--romancistas', type=int, default=1_000)
+    parser.add_argument('--livros', type=int, default=20_000)
+    parser.add_argument('--requests', type=int, default=2_000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument(
+        '--bulk-size',
+        type=int,
+        default=500,
+        help='Livros por requisição no cenário bulk.',
+    )
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument(
+        '--env',
+        action='append',
+        default=[],
+        metavar='CHAVE=VALOR',
+        help='Sobrescreve uma variável de Settings (ex.: DB_POOL_SIZE=20).',
+    )
+    parser.add_argument('--output', type=Path)
+    parser.add_argument('--compare', type=Path)
+    return parser.parse_args(argv)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def against_server(args, catalog, workers: int) -> dict:
+    import httpx
+
+    env = server_environment(args.port, workers)
+    cache = cache_config(env)
+    if cache['size'] == 0:
+        print(f'workers={workers}: sem CACHE_URL, cache desligado')
+
+    with uvicorn_server(env) as base_url:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(
+            base_url=base_url, limits=limits, timeout=60
+        ) as client:
+            await wait_until_ready(client)
+            await login_tokens(client, catalog)
+            return {'cache': cache, **await drive(client, catalog, args)}
+
+
+async def benchmark(args) -> dict:
+    import httpx
+
+    await seed(args.contas, args.romancistas, args.livros)
+    catalog = Catalog(
+        args.contas, args.romancistas, args.livros, bulk_size=args.bulk_size
+    )
+
+    if args.server == 'inprocess':
+        from madr.app import app
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url='http://madr'
+        ) as client:
+            await login_tokens(client, catalog)
+            return await drive(client, catalog, args)
+
+    if len(args.workers) == 1:
+        return await against_server(args, catalog, args.workers[0])
+
+    scaling = []
+    for workers in args.workers:
+        results = await against_server(args, catalog, workers)
+        scaling.append({'workers': workers, **results})
+    return {**scaling[-1], 'scaling': scaling}
+
+
+def compare(current: dict, previous: dict):
+    print(f'{"endpoint":<16}{"rps":>20}{"p99 ms":>24}')
+    for name, stats in current['endpoints'].items():
+        before = previous['endpoints'].get(name)
+        if before is None:
+            continue
+        print(
+            f'{name:<16}'
+            f'{before["rps"]:>9} -> {stats["rps"]:<9}'
+            f'{before["p99_ms"]:>11} -> {stats["p99_ms"]:<9}'
+        )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    overrides = dict(item.split('=', 1) for item in args.env)
+
+    with database(args.database) as database_url:
+        configure_environment(database_url, overrides)
+        results = asyncio.run(benchmark(args))
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.now(tz=timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'database': args.database,
+            'server': args.server,
+            'workers': args.workers,
+            'mix': args.mix,
+            'contas': args.contas,
+            'romancistas': args.romancistas,
+            'livros': args.livros,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'bulk_size': args.bulk_size,
+            'settings': overrides,
+        },
+        **results,
+    }
+
+    print(json.dumps(report['overall'], indent=2))
+    for name, stats in report['endpoints'].items():
+        print(
+            f'{name:<16} rps={stats["rps"]:<9} p50={stats["p50_ms"]:<9}'
+            f' p95={stats["p95_ms"]:<9} p99={stats["p99_ms"]:<9}'
+            f' erros={stats["errors"]}'
+            + (
+                f' linhas/s={stats["rows_per_s"]}'
+                if 'rows_per_s' in stats
+                else ''
+            )
+        )
+
+    for run in report.get('scaling', []):
+        overall = run['overall']
+        print(
+            f'workers={run["workers"]:<3} rps={overall["rps"]:<9}'
+            f' p99={overall["p99_ms"]:<9}'
+            f' x{overall["rps"] / report["scaling"][0]["overall"]["rps"]:.2f}'
+        )
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.compare:
+        compare(report, json.loads(args.compare.read_text()))
+
+
+if __name__ == '__main__':
+    main()
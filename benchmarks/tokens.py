@@ -0,0 +1,76 @@
+"""Custo da validação de token com o cache frio e quente.
+
+Mede madr.security._decode_token sem processo de servidor: no modo
+frio o cache de payloads é limpo antes de cada chamada, então toda
+validação verifica a assinatura e as claims; no modo quente o mesmo
+token é resolvido pelo digest no TTLCache. Exemplo:
+
+    python -m benchmarks.tokens --iterations 50000
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.harness import configure_environment
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=50_000)
+    parser.add_argument('--tokens', type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def measure(decode, tokens: list[str], iterations: int, before=None):
+    elapsed = 0.0
+    for i in range(iterations):
+        token = tokens[i % len(tokens)]
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        decode(token)
+        elapsed += time.perf_counter() - start
+
+    return {
+        'iterations': iterations,
+        'us_per_call': round(elapsed / iterations * 1_000_000, 3),
+        'calls_per_s': round(iterations / elapsed, 1),
+    }
+
+
+def benchmark(args) -> dict:
+    from madr import security
+
+    decode = security._decode_token
+    cache = security._token_cache
+    tokens = [
+        security.create_access_token({
+            'sub': f'conta{i}@madr.dev',
+            'id': i,
+            'ver': 0,
+        })
+        for i in range(1, args.tokens + 1)
+    ]
+
+    cold = measure(decode, tokens, args.iterations, before=cache.clear)
+    cache.clear()
+    warm = measure(decode, tokens, args.iterations)
+
+    return {
+        'cold': cold,
+        'warm': warm,
+        'speedup': round(cold['us_per_call'] / warm['us_per_call'], 2),
+        'hit_ratio': round(cache.hits / (cache.hits + cache.misses), 4),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    configure_environment('sqlite+aiosqlite:///:memory:')
+    print(json.dumps(benchmark(args), indent=2))
+
+
+if __name__ == '__main__':
+    main()
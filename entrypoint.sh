@@ -2,4 +2,4 @@
 
 poetry run alembic upgrade head
 
-poetry run uvicorn --host 0.0.0.0 --port 8000 madr.app:app
+exec poetry run python -m madr.server
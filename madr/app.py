@@ -1,16 +1,142 @@
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
 from http import HTTPStatus
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 
-from madr.routers import auth, conta, livro, romancista
+from madr.database import (
+    PRIMARY_COOKIE,
+    RequestStats,
+    dispose_engine,
+    request_stats,
+)
+from madr.metrics import (
+    http_in_flight,
+    http_request_duration,
+    http_requests,
+    registry,
+)
+from madr.responses import check_fast_json
+from madr.routers import (
+    auth,
+    conta,
+    health,
+    livro,
+    metrics,
+    romancista,
+    stats,
+)
 from madr.schemas import Message
+from madr.security import shutdown_hash_executor
+from madr.settings import Settings
 
-app = FastAPI()
+settings = Settings()  # type: ignore
+
+
+async def grava_metricas_periodicamente():
+    while True:
+        registry.write_snapshot()
+        await asyncio.sleep(settings.METRICS_FLUSH_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    check_fast_json(settings)
+    metrics_task = None
+    if settings.METRICS_ENABLED and settings.METRICS_DIR:
+        metrics_task = asyncio.create_task(grava_metricas_periodicamente())
+
+    yield
+
+    if metrics_task:
+        metrics_task.cancel()
+        registry.remove_snapshot()
+    shutdown_hash_executor()
+    await dispose_engine()
+
+
+logger = logging.getLogger('madr.request')
+
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(auth.router)
 app.include_router(conta.router)
+app.include_router(health.router)
 app.include_router(livro.router)
+app.include_router(metrics.router)
 app.include_router(romancista.router)
+app.include_router(stats.router)
+
+
+@app.middleware('http')
+async def instrumenta_requisicao(request: Request, call_next):
+    stats = RequestStats()
+    token = request_stats.set(stats)
+    metrics_enabled = settings.METRICS_ENABLED
+    if metrics_enabled:
+        http_in_flight.inc()
+    start = time.perf_counter()
+
+    try:
+        response = await call_next(request)
+    finally:
+        request_stats.reset(token)
+        if metrics_enabled:
+            http_in_flight.dec()
+
+    elapsed = time.perf_counter() - start
+
+    if metrics_enabled:
+        route = request.scope.get('route')
+        route_path = route.path if route else 'unmatched'
+        http_requests.inc(request.method, route_path, response.status_code)
+        http_request_duration.observe(elapsed, request.method, route_path)
+
+    response.headers['Server-Timing'] = (
+        f'{stats.server_timing()}, total;dur={elapsed * 1000:.2f}'
+    )
+    logger.info(
+        json.dumps({
+            'event': 'request',
+            'method': request.method,
+            'path': request.url.path,
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 2),
+            'db_queries': stats.count,
+            'db_duration_ms': round(stats.duration * 1000, 2),
+            'slowest': [
+                {'duration_ms': round(duration * 1000, 2), 'statement': sql}
+                for duration, sql in stats.slowest
+            ],
+        })
+    )
+
+    return response
+
+
+@app.middleware('http')
+async def le_do_primario_apos_escrita(request: Request, call_next):
+    response = await call_next(request)
+
+    if (
+        settings.DATABASE_REPLICA_URLS
+        and request.method not in SAFE_METHODS
+        and response.status_code < HTTPStatus.BAD_REQUEST
+    ):
+        response.set_cookie(
+            PRIMARY_COOKIE,
+            '1',
+            max_age=settings.READ_YOUR_WRITES_SECONDS,
+            httponly=True,
+            samesite='lax',
+        )
+
+    return response
 
 
 @app.get('/', status_code=HTTPStatus.OK, response_model=Message)
@@ -0,0 +1,284 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any
+
+from madr.settings import Settings
+
+# Written over invalidated keys so that a read which loaded the row
+# before the write committed cannot put the old payload back.
+TOMBSTONE = ''
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Any, tuple[Any, float]] = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+
+        if item is None:
+            self.misses += 1
+            return default
+
+        value, expires_at = item
+        if expires_at <= time.time():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, expires_at: float | None = None):
+        if self.maxsize <= 0:
+            return
+
+        if self.ttl is not None:
+            ttl_expires_at = time.time() + self.ttl
+            if expires_at is None or ttl_expires_at < expires_at:
+                expires_at = ttl_expires_at
+
+        if expires_at is None:
+            expires_at = float('inf')
+
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def add(self, key, value, expires_at: float | None = None) -> bool:
+        item = self._data.get(key)
+        if item is not None and item[1] > time.time():
+            return False
+
+        self.set(key, value, expires_at)
+        return True
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def keys(self):
+        return list(self._data)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class MemoryBackend:
+    name = 'memory'
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Kept apart so that filling the cache cannot evict them.
+        self._marks = TTLCache(maxsize=maxsize)
+
+    async def get(self, key: str) -> str | None:
+        return self._cache.get(key)
+
+    async def mark(self, key: str, seconds: float | None):
+        expires_at = None if seconds is None else time.time() + seconds
+        self._marks.set(key, True, expires_at=expires_at)
+
+    async def marked(self, key: str) -> bool:
+        return self._marks.get(key, False)
+
+    async def add(self, key: str, value: str):
+        self._cache.add(key, value)
+
+    async def hold(self, keys, seconds: float):
+        expires_at = time.time() + seconds
+        for key in keys:
+            self._cache.set(key, TOMBSTONE, expires_at=expires_at)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._cache.delete(key)
+
+    async def delete_prefix(self, prefix: str):
+        for key in self._cache.keys():
+            if key.startswith(prefix):
+                self._cache.delete(key)
+
+    async def clear(self):
+        self._cache.clear()
+        self._marks.clear()
+
+
+class RedisBackend:
+    name = 'redis'
+
+    # Versioned with the entry format, so a deploy never reads entries
+    # written by the previous release.
+    def __init__(self, client, ttl: int | None = None, namespace='madr:2:'):
+        self.client = client
+        self.ttl = ttl
+        self.namespace = namespace
+
+    async def get(self, key: str) -> str | None:
+        value = await self.client.get(self.namespace + key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def add(self, key: str, value: str):
+        await self.client.set(
+            self.namespace + key, value, ex=self.ttl, nx=True
+        )
+
+    async def mark(self, key: str, seconds: float | None):
+        await self.client.set(
+            self.namespace + key,
+            '1',
+            px=None if seconds is None else int(seconds * 1000),
+        )
+
+    async def marked(self, key: str) -> bool:
+        return bool(await self.client.exists(self.namespace + key))
+
+    async def hold(self, keys, seconds: float):
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(
+                    self.namespace + key, TOMBSTONE, px=int(seconds * 1000)
+                )
+            await pipe.execute()
+
+    async def delete(self, *keys: str):
+        await self.client.delete(*(self.namespace + key for key in keys))
+
+    async def delete_prefix(self, prefix: str):
+        keys = [
+            key
+            async for key in self.client.scan_iter(
+                match=f'{self.namespace}{prefix}*'
+            )
+        ]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def clear(self):
+        await self.delete_prefix('')
+
+
+class EntityCache:
+    def __init__(
+        self,
+        backend,
+        hold_seconds: float = 0,
+        ttl: float | None = None,
+    ):
+        self.backend = backend
+        self.hold_seconds = hold_seconds
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.lookup_time_total = 0.0
+
+    async def get(self, key: str) -> dict | None:
+        start = time.perf_counter()
+        value = await self.backend.get(key)
+        entry = json.loads(value) if value else None
+
+        if (
+            entry is not None
+            and entry['scope'] is not None
+            and await self.backend.marked(f'dropped:{entry["scope"]}')
+        ):
+            entry = None
+        self.lookup_time_total += time.perf_counter() - start
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry['value']
+
+    async def set(self, key: str, value: dict, scope: str | None = None):
+        await self.backend.add(
+            key, json.dumps({'scope': scope, 'value': value})
+        )
+
+    async def invalidate(self, *keys: str):
+        if not keys:
+            return
+
+        if self.hold_seconds > 0:
+            await self.backend.hold(keys, self.hold_seconds)
+        else:
+            await self.backend.delete(*keys)
+
+    async def invalidate_scope(self, scope: str):
+        # Drops every entry filled under the scope with one write,
+        # whatever their number. The mark has to outlive them: an entry
+        # lives for the TTL from a fill that may come up to the hold time
+        # after the invalidation.
+        seconds = None if self.ttl is None else self.ttl + self.hold_seconds
+        await self.backend.mark(f'dropped:{scope}', seconds)
+
+    async def clear(self):
+        await self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+        self.lookup_time_total = 0.0
+
+    def status(self) -> dict:
+        lookups = self.hits + self.misses
+
+        return {
+            'backend': self.backend.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'lookup_time_avg': (
+                self.lookup_time_total / lookups if lookups else 0.0
+            ),
+        }
+
+
+def invalidation_hold(settings: Settings) -> float:
+    # Reads may come from a replica that has not applied the write yet.
+    # Holding the tombstone for the replica lag budget keeps such a read
+    # from putting the old row back in the cache.
+    if settings.DATABASE_REPLICA_URLS:
+        return max(
+            settings.CACHE_INVALIDATION_HOLD_SECONDS,
+            settings.READ_YOUR_WRITES_SECONDS,
+        )
+
+    return settings.CACHE_INVALIDATION_HOLD_SECONDS
+
+
+def build_entity_cache(settings: Settings) -> EntityCache:
+    if settings.CACHE_URL:
+        import redis.asyncio as redis  # noqa: PLC0415
+
+        return EntityCache(
+            RedisBackend(
+                redis.from_url(settings.CACHE_URL),
+                ttl=settings.CACHE_TTL_SECONDS,
+            ),
+            hold_seconds=invalidation_hold(settings),
+            ttl=settings.CACHE_TTL_SECONDS,
+        )
+
+    return EntityCache(
+        MemoryBackend(
+            maxsize=settings.CACHE_SIZE, ttl=settings.CACHE_TTL_SECONDS
+        ),
+        hold_seconds=invalidation_hold(settings),
+        ttl=settings.CACHE_TTL_SECONDS,
+    )
+
+
+entity_cache = build_entity_cache(Settings())  # type: ignore
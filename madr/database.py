@@ -1,10 +1,346 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import itertools
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+import anyio
+from fastapi import Request
+from sqlalchemy import Integer, any_, bindparam, case, event, func, make_url
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from madr.settings import Settings
 
-engine = create_async_engine(Settings().DATABASE_URL)  # type: ignore
+settings = Settings()  # type: ignore
+logger = logging.getLogger('madr.sql')
 
 
-async def get_session():  # pragma: no cover
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _exhausted(self) -> bool:
+        return (
+            self.checkedin() == 0
+            and self._max_overflow > -1
+            and self.overflow() >= self._max_overflow
+        )
+
+    def connect(self):
+        exhausted = self._exhausted()
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            self.checkouts += 1
+            # Only checkouts that found the pool exhausted waited; the
+            # others spent their time opening a new DBAPI connection.
+            if exhausted:
+                elapsed = time.perf_counter() - start
+                self.waits += 1
+                self.wait_time_total += elapsed
+                self.wait_time_max = max(self.wait_time_max, elapsed)
+
+
+def engine_options(settings: Settings, url: str | None = None) -> dict:
+    url = make_url(url or settings.DATABASE_URL)
+    options = {
+        'pool_pre_ping': settings.DB_POOL_PRE_PING,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+    }
+
+    if url.get_backend_name() == 'sqlite' and url.database in {
+        None,
+        '',
+        ':memory:',
+    }:
+        return options
+
+    options.update({
+        'poolclass': TimedQueuePool,
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+    })
+
+    if url.get_backend_name() == 'postgresql':
+        connect_args = {'prepare_threshold': settings.DB_PREPARE_THRESHOLD}
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            connect_args['options'] = (
+                f'-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}'
+            )
+        options['connect_args'] = connect_args
+
+    return options
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+def build_engine(settings: Settings, url: str | None = None) -> AsyncEngine:
+    engine = create_async_engine(
+        url or settings.DATABASE_URL, **engine_options(settings, url)
+    )
+
+    if engine.dialect.name == 'sqlite':
+        event.listen(
+            engine.sync_engine, 'connect', _enable_sqlite_foreign_keys
+        )
+
+    return engine
+
+
+def pool_status(engine: AsyncEngine) -> dict:
+    pool = engine.pool
+
+    return {
+        'pool': type(pool).__name__,
+        'size': getattr(pool, 'size', lambda: 0)(),
+        'checked_in': getattr(pool, 'checkedin', lambda: 0)(),
+        'checked_out': getattr(pool, 'checkedout', lambda: 0)(),
+        'overflow': getattr(pool, 'overflow', lambda: 0)(),
+        'checkouts': getattr(pool, 'checkouts', 0),
+        'waits': getattr(pool, 'waits', 0),
+        'wait_time_total': getattr(pool, 'wait_time_total', 0.0),
+        'wait_time_max': getattr(pool, 'wait_time_max', 0.0),
+    }
+
+
+def dialect_insert(session: AsyncSession, entity):
+    if session.bind.dialect.name == 'postgresql':
+        return postgresql.insert(entity)
+
+    return sqlite.insert(entity)
+
+
+def any_of(session: AsyncSession, column, values: list[int]):
+    if session.bind.dialect.name == 'postgresql':
+        return column == any_(
+            bindparam('ids', values, type_=postgresql.ARRAY(Integer))
+        )
+
+    return column.in_(values)
+
+
+def position_of(session: AsyncSession, column, values: list[int]):
+    if session.bind.dialect.name == 'postgresql':
+        return func.array_position(
+            bindparam('posicoes', values, type_=postgresql.ARRAY(Integer)),
+            column,
+        )
+
+    return case(
+        {value: index for index, value in enumerate(values)}, value=column
+    )
+
+
+def is_foreign_key_violation(exc: IntegrityError) -> bool:
+    return getattr(
+        exc.orig, 'sqlstate', None
+    ) == '23503' or 'FOREIGN KEY' in str(exc.orig)
+
+
+class QueryCounter:
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.statements: list[str] = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(
+            self.engine.sync_engine, 'before_cursor_execute', self._record
+        )
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(
+            self.engine.sync_engine, 'before_cursor_execute', self._record
+        )
+
+
+@dataclass
+class RequestStats:
+    count: int = 0
+    duration: float = 0.0
+    slowest: list[tuple[float, str]] = field(default_factory=list)
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.duration += elapsed
+        self.slowest.append((elapsed, statement))
+        self.slowest.sort(reverse=True)
+        del self.slowest[settings.QUERY_LOG_SLOWEST :]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration * 1000:.2f};desc="{self.count} queries"'
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar(
+    'request_stats', default=None
+)
+
+
+def _before_cursor_execute(
+    conn, cursor, statement, parameters, context, *args
+):
+    # Kept on the execution context rather than the connection so a
+    # statement that fails cannot leave a start time behind on a pooled
+    # connection.
+    if context is not None:
+        context.madr_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, *args):
+    start = getattr(context, 'madr_query_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+
+    stats = request_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        logger.warning(
+            json.dumps({
+                'event': 'slow_query',
+                'duration_ms': round(elapsed * 1000, 2),
+                'statement': statement,
+            })
+        )
+
+
+def instrument_engine(engine: AsyncEngine):
+    event.listen(
+        engine.sync_engine, 'before_cursor_execute', _before_cursor_execute
+    )
+    event.listen(
+        engine.sync_engine, 'after_cursor_execute', _after_cursor_execute
+    )
+
+
+_engines: dict[tuple[int, str], AsyncEngine] = {}
+
+
+def _engine_for(url: str) -> AsyncEngine:
+    pid = os.getpid()
+    engine = _engines.get((pid, url))
+    if engine is None:
+        for key, inherited in list(_engines.items()):
+            if key[0] != pid:
+                inherited.sync_engine.dispose(close=False)
+                del _engines[key]
+
+        engine = build_engine(settings, url)
+        instrument_engine(engine)
+        _engines[pid, url] = engine
+    return engine
+
+
+def get_engine() -> AsyncEngine:
+    return _engine_for(settings.DATABASE_URL)
+
+
+def get_replica_engines() -> list[AsyncEngine]:
+    return [_engine_for(url) for url in settings.DATABASE_REPLICA_URLS]
+
+
+async def dispose_engine():
+    pid = os.getpid()
+    for key in [key for key in _engines if key[0] == pid]:
+        await _engines.pop(key).dispose()
+
+
+class ReplicaSelector:
+    def __init__(self, strategy: str):
+        self.strategy = strategy
+        self._turn = itertools.count()
+
+    def choose(self, engines: list[AsyncEngine]) -> AsyncEngine:
+        if self.strategy == 'least_connections':
+            return min(
+                engines,
+                key=lambda engine: getattr(
+                    engine.pool, 'checkedout', lambda: 0
+                )(),
+            )
+
+        return engines[next(self._turn) % len(engines)]
+
+
+replica_selector = ReplicaSelector(settings.DB_REPLICA_STRATEGY)
+
+PRIMARY_COOKIE = 'madr_primary'
+
+
+def read_engine(request: Request) -> AsyncEngine:
+    replicas = get_replica_engines()
+    if not replicas or request.cookies.get(PRIMARY_COOKIE):
+        return get_engine()
+
+    return replica_selector.choose(replicas)
+
+
+async def with_session(engine: AsyncEngine, func, *args):
     async with AsyncSession(engine, expire_on_commit=False) as session:
+        return await func(session, *args)
+
+
+async def snapshot_session(engine: AsyncEngine) -> AsyncSession:
+    # Every statement of the session's transaction reads the same
+    # snapshot. SQLite readers only ever see committed state, and pysqlite
+    # does not open a transaction for SELECTs, so this is Postgres-only.
+    session = AsyncSession(engine, expire_on_commit=False)
+
+    if engine.dialect.name == 'postgresql':
+        await session.connection(
+            execution_options={'isolation_level': 'REPEATABLE READ'}
+        )
+
+    return session
+
+
+async def close_session(session: AsyncSession):
+    # A cancelled request (client gone mid-stream) must still hand its
+    # connection back and drop any open server-side cursor.
+    with anyio.CancelScope(shield=True):
+        await session.close()
+
+
+async def get_read_engine(request: Request) -> AsyncEngine:  # pragma: no cover
+    return read_engine(request)
+
+
+async def get_session():  # pragma: no cover
+    async with AsyncSession(get_engine(), expire_on_commit=False) as session:
+        yield session
+
+
+async def get_read_session(request: Request):  # pragma: no cover
+    async with AsyncSession(
+        read_engine(request), expire_on_commit=False
+    ) as session:
         yield session
@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+from collections.abc import Callable
+from contextlib import asynccontextmanager
+from typing import Literal
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Row, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.database import close_session
+from madr.settings import Settings
+
+settings = Settings()  # type: ignore
+
+ExportFormat = Literal['ndjson', 'csv']
+
+MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def _encode_ndjson(fields, rows) -> str:
+    return ''.join(
+        json.dumps(dict(zip(fields, row)), ensure_ascii=False) + '\n'
+        for row in rows
+    )
+
+
+def _encode_ndjson_items(items) -> str:
+    return ''.join(
+        json.dumps(item, ensure_ascii=False) + '\n' for item in items
+    )
+
+
+def _encode_csv(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+@asynccontextmanager
+async def _streamed(session: AsyncSession, query: Select):
+    # The session dependency has already exited when the body streams,
+    # so the stream owns the connection and releases it when done.
+    try:
+        yield await session.stream(
+            query.execution_options(yield_per=settings.EXPORT_CHUNK_SIZE)
+        )
+    finally:
+        await close_session(session)
+
+
+async def _stream_rows(session: AsyncSession, query: Select, formato):
+    async with _streamed(session, query) as result:
+        fields = list(result.keys())
+
+        if formato == 'csv':
+            yield _encode_csv([fields])
+
+        async for rows in result.partitions():
+            if formato == 'csv':
+                yield _encode_csv(rows)
+            else:
+                yield _encode_ndjson(fields, rows)
+
+
+def export_response(
+    session: AsyncSession, query: Select, formato: ExportFormat, nome: str
+) -> StreamingResponse:
+    return StreamingResponse(
+        _stream_rows(session, query, formato),
+        media_type=MEDIA_TYPES[formato],
+        headers={
+            'Content-Disposition': f'attachment; filename="{nome}.{formato}"'
+        },
+    )
+
+
+async def _stream_batch(
+    session: AsyncSession, query: Select, ids: list[int], payload
+):
+    ausentes = dict.fromkeys(ids)
+
+    async with _streamed(session, query) as result:
+        async for rows in result.partitions():
+            items = [payload(row) for row in rows]
+            for item in items:
+                ausentes.pop(item['id'], None)
+            yield _encode_ndjson_items(items)
+
+    yield json.dumps({'ausentes': list(ausentes)}) + '\n'
+
+
+def batch_response(
+    session: AsyncSession,
+    query: Select,
+    ids: list[int],
+    payload: Callable[[Row], dict],
+    etag: str,
+) -> StreamingResponse:
+    return StreamingResponse(
+        _stream_batch(session, query, ids, payload),
+        media_type=MEDIA_TYPES['ndjson'],
+        headers={'ETag': etag},
+    )
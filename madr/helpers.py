@@ -1,2 +1,83 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from hashlib import blake2b
+from http import HTTPStatus
+
+from fastapi import HTTPException
+
+
 def sanitize_str(string: str) -> str:
     return string.rstrip().lstrip().strip().lower()
+
+
+def contains_pattern(term: str) -> str:
+    escaped = (
+        term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    )
+    return f'%{escaped}%'
+
+
+def encode_cursor(*values: int) -> str:
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor: str, size: int) -> list[int]:
+    padding = '=' * (-len(cursor) % 4)
+
+    try:
+        values = json.loads(urlsafe_b64decode(cursor + padding))
+    except (BinasciiError, UnicodeDecodeError, ValueError):
+        raise ValueError('cursor inválido')
+
+    if (
+        not isinstance(values, list)
+        or len(values) != size
+        or not all(type(value) is int for value in values)
+    ):
+        raise ValueError('cursor inválido')
+
+    return values
+
+
+def make_etag(*parts) -> str:
+    digest = blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    return '*' in tags or etag in tags
+
+
+def unique_ids(ids) -> list[int]:
+    return list(dict.fromkeys(int(value) for value in ids))
+
+
+def batch_ids(ids, max_ids: int) -> list[int]:
+    ids = unique_ids(ids)
+
+    if len(ids) > max_ids:
+        raise HTTPException(
+            status_code=HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+            detail=f'Máximo de {max_ids} ids por lote.',
+        )
+
+    return ids
+
+
+def order_by_ids(
+    ids: list[int], items: list[dict]
+) -> tuple[list[dict], list[int]]:
+    by_id = {item['id']: item for item in items}
+    found = [by_id[id] for id in ids if id in by_id]
+    missing = [id for id in ids if id not in by_id]
+    return found, missing
+
+
+def wants_ndjson(accept: str | None) -> bool:
+    return 'application/x-ndjson' in (accept or '')
@@ -0,0 +1,285 @@
+import json
+import os
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+
+from madr.settings import Settings
+
+settings = Settings()  # type: ignore
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _format_labels(labelnames, labelvalues, extra=()) -> str:
+    pairs = [*zip(labelnames, labelvalues), *extra]
+    if not pairs:
+        return ''
+
+    escaped = (
+        str(value)
+        .replace('\\', r'\\')
+        .replace('"', r'\"')
+        .replace('\n', r'\n')
+        for _, value in pairs
+    )
+    return (
+        '{'
+        + ','.join(
+            f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)
+        )
+        + '}'
+    )
+
+
+class Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = defaultdict(float)
+
+    def snapshot(self) -> dict:
+        return {
+            json.dumps(labels): value for labels, value in self._values.items()
+        }
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0.0)
+
+    def clear(self):
+        self._values.clear()
+
+    def render(self, samples: dict) -> list[str]:
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        for labels, value in sorted(samples.items()):
+            lines.append(
+                f'{self.name}'
+                f'{_format_labels(self.labelnames, json.loads(labels))} '
+                f'{value}'
+            )
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount: float = 1.0):
+        self._values[labels] += amount
+
+    def set_total(self, value: float, *labels):
+        # For running totals kept elsewhere (pool, cache) and copied in by
+        # a collector; the value must only ever grow.
+        self._values[labels] = value
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, *labels, amount: float = 1.0):
+        self._values[labels] += amount
+
+    def dec(self, *labels, amount: float = 1.0):
+        self._values[labels] -= amount
+
+    def set(self, value: float, *labels):
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=None):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets or DEFAULT_BUCKETS)
+        self._values = {}
+
+    def observe(self, value: float, *labels):
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0] * (len(self.buckets) + 2)
+
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self, samples: dict) -> list[str]:
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        for labels, series in sorted(samples.items()):
+            labelvalues = json.loads(labels)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), series):
+                cumulative += count
+                bucket_labels = _format_labels(
+                    self.labelnames, labelvalues, [('le', bound)]
+                )
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            labels_text = _format_labels(self.labelnames, labelvalues)
+            lines.extend([
+                f'{self.name}_sum{labels_text} {series[-1]}',
+                f'{self.name}_count{labels_text} {cumulative}',
+            ])
+        return lines
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(current, other):
+    if isinstance(current, list):
+        return [a + b for a, b in zip(current, other)]
+    return current + other
+
+
+class Registry:
+    def __init__(self, directory: str | None = None):
+        self.metrics: list[Metric] = []
+        self.collectors = []
+        self.directory = Path(directory) if directory else None
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        self.collectors.append(func)
+        return func
+
+    def snapshot(self) -> dict:
+        for collect in self.collectors:
+            collect()
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def _snapshot_path(self) -> Path:
+        return self.directory / f'{os.getpid()}.json'
+
+    def write_snapshot(self):
+        if self.directory is None:
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._snapshot_path()
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.snapshot()))
+        tmp_path.replace(path)
+
+    def remove_snapshot(self):
+        if self.directory is not None:
+            self._snapshot_path().unlink(missing_ok=True)
+
+    def _snapshots(self):
+        if self.directory is None:
+            yield self.snapshot()
+            return
+
+        self.write_snapshot()
+        for path in self.directory.glob('*.json'):
+            # Workers that crashed never remove their snapshot; without
+            # this their totals would be added in forever.
+            if path.stem.isdigit() and not _pid_alive(int(path.stem)):
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                yield json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+
+    def render(self) -> str:
+        merged = defaultdict(dict)
+        for snapshot in self._snapshots():
+            for name, samples in snapshot.items():
+                for labels, value in samples.items():
+                    current = merged[name].get(labels)
+                    merged[name][labels] = (
+                        value if current is None else _merge(current, value)
+                    )
+
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render(merged.get(metric.name, {})))
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        for metric in self.metrics:
+            metric.clear()
+
+
+registry = Registry(settings.METRICS_DIR)
+
+http_requests = registry.register(
+    Counter(
+        'madr_http_requests_total',
+        'Requisições HTTP atendidas.',
+        ('method', 'route', 'status'),
+    )
+)
+http_request_duration = registry.register(
+    Histogram(
+        'madr_http_request_duration_seconds',
+        'Duração das requisições HTTP.',
+        ('method', 'route'),
+    )
+)
+http_in_flight = registry.register(
+    Gauge('madr_http_requests_in_flight', 'Requisições em andamento.')
+)
+password_hash_duration = registry.register(
+    Histogram(
+        'madr_password_hash_duration_seconds',
+        'Duração do hash e da verificação de senhas com Argon2.',
+        ('operation',),
+    )
+)
+db_pool = registry.register(
+    Gauge(
+        'madr_db_pool_connections',
+        'Conexões do pool do banco por estado.',
+        ('state',),
+    )
+)
+db_pool_wait = registry.register(
+    Counter(
+        'madr_db_pool_wait_seconds_total',
+        'Tempo total aguardando conexões do pool.',
+    )
+)
+entity_cache_lookups = registry.register(
+    Counter(
+        'madr_entity_cache_lookups_total',
+        'Consultas ao cache de entidades por resultado.',
+        ('result',),
+    )
+)
+singleflight_calls = registry.register(
+    Counter(
+        'madr_singleflight_calls_total',
+        'Leituras por tipo, executadas (leader) ou coalescidas (collapsed).',
+        ('kind', 'result'),
+    )
+)
@@ -1,8 +1,16 @@
-from sqlalchemy import ForeignKey
+from sqlalchemy import DDL, ForeignKey, Index, event
 from sqlalchemy.orm import Mapped, mapped_column, registry, relationship
 
 table_registry = registry()
 
+event.listen(
+    table_registry.metadata,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(
+        dialect='postgresql'
+    ),
+)
+
 
 @table_registry.mapped_as_dataclass
 class Conta:
@@ -12,16 +20,34 @@ class Conta:
     username: Mapped[str] = mapped_column(unique=True)
     email: Mapped[str] = mapped_column(unique=True)
     password: Mapped[str]
+    token_version: Mapped[int] = mapped_column(
+        init=False, default=0, server_default='0'
+    )
 
 
 @table_registry.mapped_as_dataclass
 class Livro:
     __tablename__ = 'livros'
+    __table_args__ = (
+        Index('ix_livros_ano_id', 'ano', 'id'),
+        Index('ix_livros_romancista_id_ano', 'romancista_id', 'ano'),
+        Index(
+            'ix_livros_titulo_trgm',
+            'titulo',
+            postgresql_using='gin',
+            postgresql_ops={'titulo': 'gin_trgm_ops'},
+        ).ddl_if(dialect='postgresql'),
+    )
 
     id: Mapped[int] = mapped_column(init=False, primary_key=True)
     ano: Mapped[int]
     titulo: Mapped[str] = mapped_column(unique=True)
-    romancista_id: Mapped[int] = mapped_column(ForeignKey('romancistas.id'))
+    romancista_id: Mapped[int] = mapped_column(
+        ForeignKey('romancistas.id', ondelete='CASCADE')
+    )
+    versao: Mapped[int] = mapped_column(
+        init=False, default=1, server_default='1'
+    )
 
     romancista: Mapped['Romancista'] = relationship(
         init=False, back_populates='livros', lazy='select'
@@ -31,10 +57,50 @@ class Livro:
 @table_registry.mapped_as_dataclass
 class Romancista:
     __tablename__ = 'romancistas'
+    __table_args__ = (
+        Index(
+            'ix_romancistas_nome_trgm',
+            'nome',
+            postgresql_using='gin',
+            postgresql_ops={'nome': 'gin_trgm_ops'},
+        ).ddl_if(dialect='postgresql'),
+    )
 
     id: Mapped[int] = mapped_column(init=False, primary_key=True)
     nome: Mapped[str] = mapped_column(unique=True)
+    versao: Mapped[int] = mapped_column(
+        init=False, default=1, server_default='1'
+    )
 
     livros: Mapped[list['Livro']] = relationship(
-        init=False, back_populates='romancista', cascade='all, delete-orphan'
+        init=False,
+        back_populates='romancista',
+        cascade='all, delete-orphan',
+        passive_deletes=True,
+    )
+
+
+@table_registry.mapped_as_dataclass
+class LivrosPorAno:
+    __tablename__ = 'livros_por_ano'
+
+    ano: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    total: Mapped[int] = mapped_column(default=0)
+
+
+@table_registry.mapped_as_dataclass
+class LivrosPorRomancista:
+    __tablename__ = 'livros_por_romancista'
+
+    romancista_id: Mapped[int] = mapped_column(
+        ForeignKey('romancistas.id', ondelete='CASCADE'), primary_key=True
     )
+    total: Mapped[int] = mapped_column(default=0)
+
+
+@table_registry.mapped_as_dataclass
+class TotalCatalogo:
+    __tablename__ = 'totais_catalogo'
+
+    nome: Mapped[str] = mapped_column(primary_key=True)
+    total: Mapped[int] = mapped_column(default=0)
@@ -0,0 +1,35 @@
+import json
+from typing import Any
+
+from fastapi.responses import Response
+
+from madr.settings import Settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def check_fast_json(settings: Settings):
+    if settings.FAST_JSON and orjson is None:
+        raise RuntimeError(
+            'FAST_JSON=true exige o orjson: instale o extra fast-json.'
+        )
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+
+    return json.dumps(
+        content, ensure_ascii=False, separators=(',', ':')
+    ).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = 'application/json'
+
+    @staticmethod
+    def render(content: Any) -> bytes:
+        return dumps(content)
@@ -10,9 +10,9 @@ from madr.database import get_session
 from madr.models import Conta
 from madr.schemas import Token
 from madr.security import (
-    create_access_token,
+    create_conta_token,
     get_current_conta,
-    verify_password,
+    verify_password_async,
 )
 
 router = APIRouter(prefix='/auth', tags=['auth'])
@@ -37,19 +37,19 @@ async def login_for_access_token(
             detail='Email ou password incorreto.',
         )
 
-    if not verify_password(form_data.password, conta.password):
+    if not await verify_password_async(form_data.password, conta.password):
         raise HTTPException(
             status_code=HTTPStatus.UNAUTHORIZED,
             detail='Email ou password incorreto.',
         )
 
-    access_token = create_access_token(data={'sub': conta.email})
+    access_token = create_conta_token(conta)
 
     return {'access_token': access_token, 'token_type': 'bearer'}
 
 
 @router.post('/refresh_token', response_model=Token)
 async def refresh_access_token(conta: CurrentConta):
-    new_access_token = create_access_token(data={'sub': conta.email})
+    new_access_token = create_conta_token(conta)
 
     return {'access_token': new_access_token, 'token_type': 'bearer'}
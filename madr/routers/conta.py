@@ -2,10 +2,10 @@ from http import HTTPStatus
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from madr.database import get_session
+from madr.database import dialect_insert, get_session
 from madr.helpers import sanitize_str
 from madr.models import Conta
 from madr.schemas import (
@@ -14,7 +14,12 @@ from madr.schemas import (
     FilterPage,
     Message,
 )
-from madr.security import get_current_conta, get_password_hash, verify_password
+from madr.security import (
+    forget_token_version,
+    get_current_conta,
+    get_password_hash_async,
+    verify_password_async,
+)
 
 router = APIRouter(prefix='/conta', tags=['conta'])
 
@@ -44,33 +49,22 @@ async def cria_conta(conta: ContaSchema, session: Session):  # type: ignore
         )
 
     db_conta = await session.scalar(
-        select(Conta).where(
-            (Conta.username == conta.username) | (Conta.email == conta.email)
+        dialect_insert(session, Conta)
+        .values(
+            username=sanitize_str(conta.username),
+            email=conta.email,
+            password=await get_password_hash_async(conta.password),
         )
+        .on_conflict_do_nothing()
+        .returning(Conta)
     )
 
-    if db_conta:
-        if db_conta.username == conta.username:
-            raise HTTPException(
-                status_code=HTTPStatus.CONFLICT,
-                detail='Conta já existe.',
-            )
-        elif db_conta.email == conta.email:
-            raise HTTPException(
-                status_code=HTTPStatus.CONFLICT, detail='Conta já existe.'
-            )
-
-    username_sanitized = sanitize_str(conta.username)
-
-    db_conta = Conta(
-        username=username_sanitized,
-        email=conta.email,
-        password=get_password_hash(conta.password),
-    )
+    if not db_conta:
+        raise HTTPException(
+            status_code=HTTPStatus.CONFLICT, detail='Conta já existe.'
+        )
 
-    session.add(db_conta)
     await session.commit()
-    await session.refresh(db_conta)
 
     return db_conta
 
@@ -107,7 +101,7 @@ async def alteracao_conta(
     if (
         current_conta.username == conta.username
         and current_conta.email == conta.email
-        and verify_password(conta.password, current_conta.password)
+        and await verify_password_async(conta.password, current_conta.password)
     ):
         raise HTTPException(
             status_code=HTTPStatus.CONFLICT,
@@ -116,10 +110,18 @@ async def alteracao_conta(
 
     current_conta.username = conta.username
     current_conta.email = conta.email  # type: ignore
-    current_conta.password = get_password_hash(conta.password)
+    current_conta.password = await get_password_hash_async(conta.password)
+    current_conta.token_version += 1
 
-    await session.commit()
-    await session.refresh(current_conta)
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(
+            status_code=HTTPStatus.CONFLICT, detail='Conta já existe.'
+        )
+
+    forget_token_version(current_conta.id)
 
     return current_conta
 
@@ -140,5 +142,6 @@ async def delete_conta(
 
     await session.delete(current_conta)
     await session.commit()
+    forget_token_version(conta_id)
 
     return {'message': 'Conta deletada com sucesso.'}
@@ -0,0 +1,32 @@
+from http import HTTPStatus
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.database import get_session
+from madr.schemas import Message
+
+router = APIRouter(prefix='/health', tags=['health'])
+
+Session = Annotated[AsyncSession, Depends(get_session)]
+
+
+@router.get('', status_code=HTTPStatus.OK, response_model=Message)
+async def verifica_vida():
+    return {'message': 'ok'}
+
+
+@router.get('/ready', status_code=HTTPStatus.OK, response_model=Message)
+async def verifica_prontidao(session: Session):
+    try:
+        await session.execute(text('SELECT 1'))
+    except (SQLAlchemyError, OSError):
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail='Banco de dados indisponível.',
+        )
+
+    return {'message': 'ok'}
@@ -1,27 +1,110 @@
+import json
 from http import HTTPStatus
-from typing import Annotated
-
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import or_, select
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from madr.database import get_session
-from madr.helpers import sanitize_str
-from madr.models import Conta, Livro, Romancista
+from typing import Annotated, Literal
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from pydantic import ValidationError
+from sqlalchemy import delete, literal, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from madr.cache import entity_cache
+from madr.database import (
+    any_of,
+    close_session,
+    dialect_insert,
+    get_read_engine,
+    get_read_session,
+    get_session,
+    is_foreign_key_violation,
+    position_of,
+    snapshot_session,
+    with_session,
+)
+from madr.export import ExportFormat, batch_response, export_response
+from madr.helpers import (
+    batch_ids,
+    contains_pattern,
+    decode_cursor,
+    encode_cursor,
+    etag_matches,
+    make_etag,
+    order_by_ids,
+    sanitize_str,
+    wants_ndjson,
+)
+from madr.models import Livro, Romancista
+from madr.responses import FastJSONResponse
 from madr.schemas import (
+    IdsBatch,
+    LivroBulkItem,
+    LivroBulkResult,
+    LivroExpandido,
     LivroFilter,
     LivroList,
     LivroPublic,
     LivroSchema,
     Message,
 )
-from madr.security import get_current_conta
+from madr.security import ContaPrincipal, get_current_principal
+from madr.settings import Settings
+from madr.singleflight import singleflight
+from madr.stats import registra_livros
 
 router = APIRouter(prefix='/livro', tags=['livro'])
+settings = Settings()  # type: ignore
 
 Session = Annotated[AsyncSession, Depends(get_session)]
-CurrentConta = Annotated[Conta, Depends(get_current_conta)]
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
+ReadEngine = Annotated[AsyncEngine, Depends(get_read_engine)]
+CurrentConta = Annotated[ContaPrincipal, Depends(get_current_principal)]
 FilterLivros = Annotated[LivroFilter, Query()]
+IfNoneMatch = Annotated[str | None, Header()]
+Accept = Annotated[str | None, Header()]
+Expand = Annotated[Literal['romancista'] | None, Query()]
+
+LIVRO_COLUMNS = (Livro.id, Livro.ano, Livro.titulo, Livro.romancista_id)
+LIVRO_FIELDS = tuple(column.key for column in LIVRO_COLUMNS)
+ROMANCISTA_EXPANDIDO = (
+    Romancista.nome.label('romancista_nome'),
+    Romancista.versao.label('romancista_versao'),
+)
+
+
+def _seleciona_livros(expand: str | None, columns=LIVRO_COLUMNS):
+    query = select(*columns, Livro.versao)
+
+    if expand == 'romancista':
+        query = query.add_columns(*ROMANCISTA_EXPANDIDO).join(Livro.romancista)
+
+    return query
+
+
+def _livro_payload(row, expand: str | None) -> dict:
+    livro = dict(zip(LIVRO_FIELDS, row))
+
+    if expand == 'romancista':
+        livro['romancista'] = {
+            'id': row.romancista_id,
+            'nome': row.romancista_nome,
+        }
+
+    return livro
+
+
+def _versoes(row, expand: str | None) -> tuple:
+    if expand == 'romancista':
+        return row.id, row.versao, row.romancista_versao
+
+    return row.id, row.versao
 
 
 @router.post('/', status_code=HTTPStatus.CREATED, response_model=LivroPublic)
@@ -33,40 +116,307 @@ async def cria_livro(
     livro.titulo = sanitize_str(livro.titulo)
 
     db_livro = await session.scalar(
-        select(Livro).where(Livro.titulo == livro.titulo)
+        dialect_insert(session, Livro)
+        .from_select(
+            ['ano', 'titulo', 'romancista_id'],
+            select(
+                literal(livro.ano),
+                literal(livro.titulo),
+                Romancista.id,
+            ).where(Romancista.id == livro.romancista_id),
+        )
+        .on_conflict_do_nothing(index_elements=['titulo'])
+        .returning(Livro)
     )
 
-    if db_livro:
+    if not db_livro:
+        romancista_id = await session.scalar(
+            select(Romancista.id).where(Romancista.id == livro.romancista_id)
+        )
+
+        if not romancista_id:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND,
+                detail='Romancista não consta no MADR.',
+            )
+
         raise HTTPException(
             status_code=HTTPStatus.CONFLICT, detail='Livro já existente.'
         )
 
-    romancista = await session.scalar(
-        select(Romancista).where(Romancista.id == livro.romancista_id)
+    await registra_livros(
+        session, criados=[(db_livro.ano, db_livro.romancista_id)]
     )
+    await session.commit()
+
+    return db_livro
 
-    if not romancista:
+
+def _parse_lote(body: bytes, content_type: str):
+    if content_type.startswith('application/x-ndjson'):
+        raw_items = [line for line in body.splitlines() if line.strip()]
+        parse = LivroSchema.model_validate_json
+    else:
+        try:
+            raw_items = json.loads(body)
+        except ValueError:
+            raw_items = None
+        parse = LivroSchema.model_validate
+
+    if not isinstance(raw_items, list):
         raise HTTPException(
-            status_code=HTTPStatus.NOT_FOUND,
-            detail='Romancista não consta no MADR.',
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail='Envie uma lista JSON ou NDJSON de livros.',
+        )
+
+    if len(raw_items) > settings.LIVRO_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+            detail=(
+                f'Máximo de {settings.LIVRO_BULK_MAX_ITEMS} livros por lote.'
+            ),
+        )
+
+    resultados = {}
+    livros = {}
+    for index, raw_item in enumerate(raw_items):
+        try:
+            livro = parse(raw_item)
+        except ValidationError as exc:
+            resultados[index] = LivroBulkItem(
+                index=index,
+                status='invalido',
+                detail=exc.errors()[0]['msg'],
+            )
+            continue
+
+        livro.titulo = sanitize_str(livro.titulo)
+        livros[index] = livro
+
+    return resultados, livros
+
+
+@router.post(
+    '/bulk',
+    status_code=HTTPStatus.OK,
+    response_model=LivroBulkResult,
+    openapi_extra={
+        'requestBody': {
+            'required': True,
+            'content': {
+                'application/json': {
+                    'schema': {
+                        'type': 'array',
+                        'items': {'$ref': '#/components/schemas/LivroSchema'},
+                    }
+                },
+                'application/x-ndjson': {'schema': {'type': 'string'}},
+            },
+        }
+    },
+)
+async def cria_livros_em_lote(
+    request: Request,
+    session: Session,  # type: ignore
+    current_conta: CurrentConta,
+):
+    resultados, livros = _parse_lote(
+        await request.body(), request.headers.get('content-type', '')
+    )
+
+    titulos_existentes = set(
+        await session.scalars(
+            select(Livro.titulo).where(
+                Livro.titulo.in_({livro.titulo for livro in livros.values()})
+            )
         )
+    )
+    romancistas_existentes = set(
+        await session.scalars(
+            select(Romancista.id).where(
+                Romancista.id.in_({
+                    livro.romancista_id for livro in livros.values()
+                })
+            )
+        )
+    )
+
+    novos = {}
+    for index, livro in livros.items():
+        if livro.titulo in titulos_existentes or livro.titulo in novos:
+            resultados[index] = LivroBulkItem(
+                index=index, status='conflito', detail='Livro já existente.'
+            )
+        elif livro.romancista_id not in romancistas_existentes:
+            resultados[index] = LivroBulkItem(
+                index=index,
+                status='romancista_inexistente',
+                detail='Romancista não consta no MADR.',
+            )
+        else:
+            novos[livro.titulo] = index
+
+    ids = {}
+    if novos:
+        try:
+            rows = (
+                await session.execute(
+                    dialect_insert(session, Livro)
+                    .on_conflict_do_nothing(index_elements=['titulo'])
+                    .returning(
+                        Livro.titulo, Livro.id, Livro.ano, Livro.romancista_id
+                    ),
+                    [livros[index].model_dump() for index in novos.values()],
+                )
+            ).all()
+            ids = {row.titulo: row.id for row in rows}
+            await registra_livros(
+                session,
+                criados=[(row.ano, row.romancista_id) for row in rows],
+            )
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            raise HTTPException(
+                status_code=HTTPStatus.CONFLICT,
+                detail='Catálogo alterado durante a importação.',
+            )
+
+    for titulo, index in novos.items():
+        if titulo in ids:
+            resultados[index] = LivroBulkItem(
+                index=index, status='criado', id=ids[titulo]
+            )
+        else:
+            resultados[index] = LivroBulkItem(
+                index=index, status='conflito', detail='Livro já existente.'
+            )
 
-    db_livro = Livro(
-        ano=livro.ano, titulo=livro.titulo, romancista_id=livro.romancista_id
+    return {
+        'criados': len(ids),
+        'resultados': [resultados[index] for index in sorted(resultados)],
+    }
+
+
+@router.get('/export', status_code=HTTPStatus.OK)
+async def exporta_livros(
+    session: ReadSession,  # type: ignore
+    formato: ExportFormat = 'ndjson',
+):
+    query = select(*LIVRO_COLUMNS).order_by(Livro.id)
+
+    return export_response(session, query, formato, 'livros')
+
+
+def _etag_do_lote(ids: list[int], rows, expand: str | None) -> str:
+    return make_etag(
+        'livros', expand, ids, sorted(_versoes(row, expand) for row in rows)
     )
 
-    session.add(db_livro)
-    await session.commit()
-    await session.refresh(db_livro)
 
-    return db_livro
+async def _busca_livros_por_ids(
+    session: AsyncSession, ids: list[int], expand: str | None
+):
+    rows = (
+        await session.execute(
+            _seleciona_livros(expand).where(any_of(session, Livro.id, ids))
+        )
+    ).all()
+    livros, ausentes = order_by_ids(
+        ids, [_livro_payload(row, expand) for row in rows]
+    )
 
+    return _etag_do_lote(ids, rows, expand), {
+        'livros': livros,
+        'ausentes': ausentes,
+    }
 
-@router.get(
-    '/{livro_id}', status_code=HTTPStatus.OK, response_model=LivroPublic
+
+async def _versoes_do_lote(
+    session: AsyncSession, ids: list[int], expand: str | None
+) -> str:
+    rows = (
+        await session.execute(
+            _seleciona_livros(expand, (Livro.id,)).where(
+                any_of(session, Livro.id, ids)
+            )
+        )
+    ).all()
+
+    return _etag_do_lote(ids, rows, expand)
+
+
+async def _livros_em_ndjson(
+    engine: AsyncEngine,
+    ids: list[int],
+    expand: str | None,
+    if_none_match: str | None = None,
+):
+    # The headers go out before the first row, so the ETag comes from a
+    # lean versions query run in the same snapshot as the streamed rows.
+    session = await snapshot_session(engine)
+
+    try:
+        etag = await _versoes_do_lote(session, ids, expand)
+    except BaseException:
+        await close_session(session)
+        raise
+
+    if etag_matches(if_none_match, etag):
+        await close_session(session)
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED, headers={'ETag': etag}
+        )
+
+    query = (
+        _seleciona_livros(expand)
+        .where(any_of(session, Livro.id, ids))
+        .order_by(position_of(session, Livro.id, ids))
+    )
+
+    return batch_response(
+        session, query, ids, lambda row: _livro_payload(row, expand), etag
+    )
+
+
+@router.post(
+    '/batch',
+    status_code=HTTPStatus.OK,
+    response_model=LivroList,
+    response_model_exclude_unset=True,
 )
-async def retorna_livro(livro_id: int, session: Session):  # type: ignore
-    livro = await session.scalar(select(Livro).where(Livro.id == livro_id))
+async def retorna_livros_por_ids(
+    lote: IdsBatch,
+    engine: ReadEngine,
+    response: Response,
+    accept: Accept = None,
+    expand: Expand = None,
+):
+    ids = batch_ids(lote.ids, settings.BATCH_MAX_IDS)
+
+    if wants_ndjson(accept):
+        return await _livros_em_ndjson(engine, ids, expand)
+
+    etag, content = await with_session(
+        engine, _busca_livros_por_ids, ids, expand
+    )
+
+    if settings.FAST_JSON:
+        return FastJSONResponse(content, headers={'ETag': etag})
+
+    response.headers['ETag'] = etag
+
+    return content
+
+
+async def _carrega_livro(
+    session: AsyncSession, livro_id: int, expand: str | None
+) -> dict:
+    livro = (
+        await session.execute(
+            _seleciona_livros(expand).where(Livro.id == livro_id)
+        )
+    ).first()
 
     if not livro:
         raise HTTPException(
@@ -74,44 +424,156 @@ async def retorna_livro(livro_id: int, session: Session):  # type: ignore
             detail='Livro não consta no MADR.',
         )
 
-    return livro
+    cached = {
+        'etag': make_etag('livro', *_versoes(livro, expand)),
+        'data': _livro_payload(livro, expand),
+    }
+    # Expanded payloads carry novelist data that a novelist update does
+    # not invalidate under livro:{id}, so only the plain form is cached.
+    if not expand:
+        await entity_cache.set(
+            f'livro:{livro_id}',
+            cached,
+            scope=f'romancista:{livro.romancista_id}',
+        )
+
+    return cached
+
+
+@router.get(
+    '/{livro_id}',
+    status_code=HTTPStatus.OK,
+    response_model=LivroExpandido,
+    response_model_exclude_unset=True,
+)
+async def retorna_livro(
+    livro_id: int,
+    engine: ReadEngine,
+    response: Response,
+    if_none_match: IfNoneMatch = None,
+    expand: Expand = None,
+):
+    cached = None if expand else await entity_cache.get(f'livro:{livro_id}')
+
+    if cached is None:
+        # The engine is part of the key so a read pinned to the primary
+        # never joins one running on a replica, and the shared task opens
+        # its own session instead of borrowing the leader's.
+        cached = await singleflight.do(
+            'livro',
+            (engine, livro_id, expand),
+            lambda: with_session(engine, _carrega_livro, livro_id, expand),
+        )
+
+    if etag_matches(if_none_match, cached['etag']):
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED,
+            headers={'ETag': cached['etag']},
+        )
+
+    response.headers['ETag'] = cached['etag']
+
+    return cached['data']
+
+
+async def _lista_livros(session: AsyncSession, livro_filter: LivroFilter):
+    expand = livro_filter.expand
+
+    if livro_filter.ids:
+        return await _busca_livros_por_ids(
+            session,
+            batch_ids(livro_filter.ids.split(','), settings.BATCH_MAX_IDS),
+            expand,
+        )
+
+    query = _seleciona_livros(expand)
+
+    if livro_filter.titulo:
+        titulo_pattern = contains_pattern(livro_filter.titulo)
+        query = query.where(Livro.titulo.ilike(titulo_pattern, escape='\\'))
 
+    if livro_filter.ano:
+        query = query.where(Livro.ano == livro_filter.ano)
 
-@router.get('/', status_code=HTTPStatus.OK, response_model=LivroList)
+    if livro_filter.order_by == 'ano':
+        sort_key = (Livro.ano, Livro.id)
+    else:
+        sort_key = (Livro.id,)
+
+    query = query.order_by(*sort_key).limit(livro_filter.limit)
+
+    if livro_filter.cursor:
+        try:
+            after = decode_cursor(livro_filter.cursor, len(sort_key))
+        except ValueError:
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                detail='Cursor inválido.',
+            )
+        query = query.where(tuple_(*sort_key) > tuple_(*after))
+    else:
+        query = query.offset(livro_filter.offset)
+
+    livros = (await session.execute(query)).all()
+
+    next_cursor = None
+    if livros and len(livros) == livro_filter.limit:
+        last = livros[-1]
+        next_cursor = encode_cursor(
+            *(getattr(last, column.key) for column in sort_key)
+        )
+
+    etag = make_etag(
+        'livros',
+        expand,
+        [_versoes(livro, expand) for livro in livros],
+        next_cursor,
+    )
+
+    return etag, {
+        'livros': [_livro_payload(livro, expand) for livro in livros],
+        'next_cursor': next_cursor,
+    }
+
+
+@router.get(
+    '/',
+    status_code=HTTPStatus.OK,
+    response_model=LivroList,
+    response_model_exclude_unset=True,
+)
 async def retorna_livro_por_nome_ano(
-    session: Session,  # type: ignore
+    engine: ReadEngine,
     livro_filter: FilterLivros,
+    response: Response,
+    if_none_match: IfNoneMatch = None,
+    accept: Accept = None,
 ):
-    if livro_filter.titulo and livro_filter.ano:
-        query = await session.scalars(
-            select(Livro)
-            .where(
-                Livro.titulo.like(f'%{livro_filter.titulo}%'),
-                Livro.ano == livro_filter.ano,
-            )
-            .offset(livro_filter.offset)
-            .limit(livro_filter.limit)
-        )
-    elif livro_filter.titulo or livro_filter.ano:
-        query = await session.scalars(
-            select(Livro)
-            .where(
-                or_(
-                    Livro.titulo.like(f'%{livro_filter.titulo}%'),
-                    Livro.ano == livro_filter.ano,
-                )
-            )
-            .offset(livro_filter.offset)
-            .limit(livro_filter.limit)
+    if livro_filter.ids and wants_ndjson(accept):
+        return await _livros_em_ndjson(
+            engine,
+            batch_ids(livro_filter.ids.split(','), settings.BATCH_MAX_IDS),
+            livro_filter.expand,
+            if_none_match,
         )
-    else:
-        query = await session.scalars(
-            select(Livro).offset(livro_filter.offset).limit(livro_filter.limit)
+
+    etag, content = await singleflight.do(
+        'livros',
+        (engine, livro_filter.model_dump_json()),
+        lambda: with_session(engine, _lista_livros, livro_filter),
+    )
+
+    if etag_matches(if_none_match, etag):
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED, headers={'ETag': etag}
         )
 
-    livros = query.all()
+    if settings.FAST_JSON:
+        return FastJSONResponse(content, headers={'ETag': etag})
+
+    response.headers['ETag'] = etag
 
-    return {'livros': livros}
+    return content
 
 
 @router.delete(
@@ -122,15 +584,23 @@ async def deleta_livro(
     session: Session,  # type: ignore
     current_conta: CurrentConta,
 ):
-    livro = await session.scalar(select(Livro).where(Livro.id == livro_id))
-    if not livro:
+    deleted = (
+        await session.execute(
+            delete(Livro)
+            .where(Livro.id == livro_id)
+            .returning(Livro.ano, Livro.romancista_id)
+        )
+    ).first()
+
+    if not deleted:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail='Livro não consta no MADR.',
         )
 
-    await session.delete(livro)
+    await registra_livros(session, removidos=[deleted.tuple()])
     await session.commit()
+    await entity_cache.invalidate(f'livro:{livro_id}')
 
     return {'message': 'Livro deletado do MADR.'}
 
@@ -144,22 +614,51 @@ async def atualiza_livro(
     session: Session,  # type: ignore
     current_conta: CurrentConta,
 ):
-    db_livro = await session.scalar(select(Livro).where(Livro.id == livro_id))
+    antigo = (
+        await session.execute(
+            select(Livro.ano, Livro.romancista_id)
+            .where(Livro.id == livro_id)
+            .with_for_update()
+        )
+    ).first()
 
-    if not db_livro:
+    if not antigo:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail='Livro não consta no MADR.',
         )
 
-    titulo_sanitized = sanitize_str(livro.titulo)
+    try:
+        db_livro = await session.scalar(
+            update(Livro)
+            .where(Livro.id == livro_id)
+            .values(
+                ano=livro.ano,
+                titulo=sanitize_str(livro.titulo),
+                romancista_id=livro.romancista_id,
+                versao=Livro.versao + 1,
+            )
+            .returning(Livro)
+        )
+    except IntegrityError as exc:
+        await session.rollback()
 
-    db_livro.ano = livro.ano
-    db_livro.titulo = titulo_sanitized
-    db_livro.romancista_id = livro.romancista_id
+        if is_foreign_key_violation(exc):
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND,
+                detail='Romancista não consta no MADR.',
+            )
 
-    session.add(db_livro)
+        raise HTTPException(
+            status_code=HTTPStatus.CONFLICT, detail='Livro já existente.'
+        )
+
+    await registra_livros(
+        session,
+        criados=[(db_livro.ano, db_livro.romancista_id)],
+        removidos=[antigo.tuple()],
+    )
     await session.commit()
-    await session.refresh(db_livro)
+    await entity_cache.invalidate(f'livro:{livro_id}')
 
     return db_livro
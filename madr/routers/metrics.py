@@ -0,0 +1,39 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from madr.cache import entity_cache
+from madr.database import get_engine, pool_status
+from madr.metrics import db_pool, db_pool_wait, entity_cache_lookups, registry
+from madr.schemas import CacheStatus, PoolStatus
+
+router = APIRouter(prefix='/metrics', tags=['metrics'])
+
+
+@registry.collector
+def coleta_pool_e_cache():
+    status = pool_status(get_engine())
+    for state in ('checked_out', 'checked_in', 'overflow'):
+        db_pool.set(status[state], state)
+    db_pool_wait.set_total(status['wait_time_total'])
+
+    entity_cache_lookups.set_total(entity_cache.hits, 'hit')
+    entity_cache_lookups.set_total(entity_cache.misses, 'miss')
+
+
+@router.get('', response_class=PlainTextResponse)
+async def retorna_metricas():
+    return PlainTextResponse(
+        registry.render(), media_type='text/plain; version=0.0.4'
+    )
+
+
+@router.get('/pool', status_code=HTTPStatus.OK, response_model=PoolStatus)
+async def retorna_status_pool():
+    return pool_status(get_engine())
+
+
+@router.get('/cache', status_code=HTTPStatus.OK, response_model=CacheStatus)
+async def retorna_status_cache():
+    return entity_cache.status()
@@ -1,68 +1,366 @@
 from http import HTTPStatus
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+)
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
-from madr.database import get_session
-from madr.helpers import sanitize_str
-from madr.models import Conta, Romancista
+from madr.cache import entity_cache
+from madr.database import (
+    any_of,
+    close_session,
+    dialect_insert,
+    get_read_engine,
+    get_read_session,
+    get_session,
+    position_of,
+    snapshot_session,
+    with_session,
+)
+from madr.export import ExportFormat, batch_response, export_response
+from madr.helpers import (
+    batch_ids,
+    contains_pattern,
+    decode_cursor,
+    encode_cursor,
+    etag_matches,
+    make_etag,
+    order_by_ids,
+    sanitize_str,
+    wants_ndjson,
+)
+from madr.models import Livro, LivrosPorRomancista, Romancista
+from madr.responses import FastJSONResponse
 from madr.schemas import (
+    IdsBatch,
     Message,
+    RomancistaFilter,
     RomancistaList,
     RomancistaPublic,
     RomancistaSchema,
 )
-from madr.security import get_current_conta
+from madr.security import ContaPrincipal, get_current_principal
+from madr.settings import Settings
+from madr.singleflight import singleflight
+from madr.stats import ajusta_estatisticas
 
 router = APIRouter(prefix='/romancista', tags=['romancista'])
+settings = Settings()  # type: ignore
 
 Session = Annotated[AsyncSession, Depends(get_session)]
-CurrentConta = Annotated[Conta, Depends(get_current_conta)]
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
+ReadEngine = Annotated[AsyncEngine, Depends(get_read_engine)]
+CurrentConta = Annotated[ContaPrincipal, Depends(get_current_principal)]
+FilterRomancistas = Annotated[RomancistaFilter, Query()]
+IfNoneMatch = Annotated[str | None, Header()]
+Accept = Annotated[str | None, Header()]
 
+ROMANCISTA_COLUMNS = (Romancista.id, Romancista.nome)
+ROMANCISTA_FIELDS = tuple(column.key for column in ROMANCISTA_COLUMNS)
+TOTAIS_FIELDS = ('total_livros', 'primeiro_ano', 'ultimo_ano')
 
-@router.get(
-    '/{romancista_id}',
+
+def _seleciona_romancistas(totais: bool, columns=ROMANCISTA_COLUMNS):
+    query = select(*columns, Romancista.versao)
+
+    if totais:
+        # The count is maintained with every book write; the year range is
+        # one endpoint probe each on ix_livros_romancista_id_ano.
+        do_romancista = Livro.romancista_id == Romancista.id
+        query = query.add_columns(
+            func.coalesce(LivrosPorRomancista.total, 0).label('total_livros'),
+            select(func.min(Livro.ano))
+            .where(do_romancista)
+            .scalar_subquery()
+            .label('primeiro_ano'),
+            select(func.max(Livro.ano))
+            .where(do_romancista)
+            .scalar_subquery()
+            .label('ultimo_ano'),
+        ).outerjoin(
+            LivrosPorRomancista,
+            LivrosPorRomancista.romancista_id == Romancista.id,
+        )
+
+    return query
+
+
+def _romancista_payload(row, totais: bool) -> dict:
+    romancista = dict(zip(ROMANCISTA_FIELDS, row))
+
+    if totais:
+        romancista.update({
+            field: getattr(row, field) for field in TOTAIS_FIELDS
+        })
+
+    return romancista
+
+
+def _versoes(row, totais: bool) -> tuple:
+    if totais:
+        return (
+            row.id,
+            row.versao,
+            *(getattr(row, field) for field in TOTAIS_FIELDS),
+        )
+
+    return row.id, row.versao
+
+
+@router.get('/export', status_code=HTTPStatus.OK)
+async def exporta_romancistas(
+    session: ReadSession,  # type: ignore
+    formato: ExportFormat = 'ndjson',
+):
+    query = select(*ROMANCISTA_COLUMNS).order_by(Romancista.id)
+
+    return export_response(session, query, formato, 'romancistas')
+
+
+def _etag_do_lote(ids: list[int], rows, totais: bool) -> str:
+    return make_etag(
+        'romancistas',
+        totais,
+        ids,
+        sorted(_versoes(row, totais) for row in rows),
+    )
+
+
+async def _busca_romancistas_por_ids(
+    session: AsyncSession, ids: list[int], totais: bool
+):
+    rows = (
+        await session.execute(
+            _seleciona_romancistas(totais).where(
+                any_of(session, Romancista.id, ids)
+            )
+        )
+    ).all()
+    romancistas, ausentes = order_by_ids(
+        ids, [_romancista_payload(row, totais) for row in rows]
+    )
+
+    return _etag_do_lote(ids, rows, totais), {
+        'romancistas': romancistas,
+        'ausentes': ausentes,
+    }
+
+
+async def _versoes_do_lote(
+    session: AsyncSession, ids: list[int], totais: bool
+) -> str:
+    rows = (
+        await session.execute(
+            _seleciona_romancistas(totais, (Romancista.id,)).where(
+                any_of(session, Romancista.id, ids)
+            )
+        )
+    ).all()
+
+    return _etag_do_lote(ids, rows, totais)
+
+
+async def _romancistas_em_ndjson(
+    engine: AsyncEngine, ids: list[int], totais: bool
+):
+    # As in livro: the ETag and the rows come from one snapshot.
+    session = await snapshot_session(engine)
+
+    try:
+        etag = await _versoes_do_lote(session, ids, totais)
+    except BaseException:
+        await close_session(session)
+        raise
+
+    query = (
+        _seleciona_romancistas(totais)
+        .where(any_of(session, Romancista.id, ids))
+        .order_by(position_of(session, Romancista.id, ids))
+    )
+
+    return batch_response(
+        session,
+        query,
+        ids,
+        lambda row: _romancista_payload(row, totais),
+        etag,
+    )
+
+
+@router.post(
+    '/batch',
     status_code=HTTPStatus.OK,
-    response_model=RomancistaPublic,
+    response_model=RomancistaList,
+    response_model_exclude_unset=True,
 )
-async def retorna_romancista(romancista_id: int, session: Session):  # type: ignore
-    db_romancista = await session.scalar(
-        select(Romancista).where(Romancista.id == romancista_id)
+async def retorna_romancistas_por_ids(
+    lote: IdsBatch,
+    engine: ReadEngine,
+    response: Response,
+    accept: Accept = None,
+    totais: bool = False,
+):
+    ids = batch_ids(lote.ids, settings.BATCH_MAX_IDS)
+
+    if wants_ndjson(accept):
+        return await _romancistas_em_ndjson(engine, ids, totais)
+
+    etag, content = await with_session(
+        engine, _busca_romancistas_por_ids, ids, totais
     )
 
+    if settings.FAST_JSON:
+        return FastJSONResponse(content, headers={'ETag': etag})
+
+    response.headers['ETag'] = etag
+
+    return content
+
+
+async def _carrega_romancista(
+    session: AsyncSession, romancista_id: int
+) -> dict:
+    db_romancista = (
+        await session.execute(
+            select(*ROMANCISTA_COLUMNS, Romancista.versao).where(
+                Romancista.id == romancista_id
+            )
+        )
+    ).first()
+
     if not db_romancista:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail='Romancista não encontrada no MADR.',
         )
 
-    return db_romancista
+    cached = {
+        'etag': make_etag(
+            'romancista', db_romancista.id, db_romancista.versao
+        ),
+        'data': dict(zip(ROMANCISTA_FIELDS, db_romancista)),
+    }
+    await entity_cache.set(f'romancista:{romancista_id}', cached)
 
+    return cached
 
-@router.get('/', status_code=HTTPStatus.OK, response_model=RomancistaList)
-async def retorna_romancista_por_nome(
-    session: Session,  # type: ignore
-    romancista_nome: str | None = None,
-    limit: int | None = 10,
-    offset: int = 0,
+
+@router.get(
+    '/{romancista_id}',
+    status_code=HTTPStatus.OK,
+    response_model=RomancistaPublic,
+)
+async def retorna_romancista(
+    romancista_id: int,
+    engine: ReadEngine,
+    response: Response,
+    if_none_match: IfNoneMatch = None,
 ):
-    if romancista_nome is None:
-        query = await session.scalars(
-            select(Romancista).limit(limit).offset(offset)
+    cached = await entity_cache.get(f'romancista:{romancista_id}')
+
+    if cached is None:
+        cached = await singleflight.do(
+            'romancista',
+            (engine, romancista_id),
+            lambda: with_session(engine, _carrega_romancista, romancista_id),
         )
+
+    if etag_matches(if_none_match, cached['etag']):
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED,
+            headers={'ETag': cached['etag']},
+        )
+
+    response.headers['ETag'] = cached['etag']
+
+    return cached['data']
+
+
+async def _lista_romancistas(
+    session: AsyncSession, romancista_filter: RomancistaFilter
+):
+    totais = romancista_filter.totais
+    query = (
+        _seleciona_romancistas(totais)
+        .order_by(Romancista.id)
+        .limit(romancista_filter.limit)
+    )
+
+    if romancista_filter.romancista_nome is not None:
+        nome_pattern = contains_pattern(romancista_filter.romancista_nome)
+        query = query.where(Romancista.nome.ilike(nome_pattern, escape='\\'))
+
+    if romancista_filter.cursor:
+        try:
+            (after_id,) = decode_cursor(romancista_filter.cursor, 1)
+        except ValueError:
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                detail='Cursor inválido.',
+            )
+        query = query.where(Romancista.id > after_id)
     else:
-        query = await session.scalars(
-            select(Romancista)
-            .where(Romancista.nome.like(f'%{romancista_nome}%'))
-            .limit(limit)
-            .offset(offset)
+        query = query.offset(romancista_filter.offset)
+
+    romancistas = (await session.execute(query)).all()
+
+    next_cursor = None
+    if romancistas and len(romancistas) == romancista_filter.limit:
+        next_cursor = encode_cursor(romancistas[-1].id)
+
+    etag = make_etag(
+        'romancistas',
+        totais,
+        [_versoes(romancista, totais) for romancista in romancistas],
+        next_cursor,
+    )
+
+    return etag, {
+        'romancistas': [
+            _romancista_payload(romancista, totais)
+            for romancista in romancistas
+        ],
+        'next_cursor': next_cursor,
+    }
+
+
+@router.get(
+    '/',
+    status_code=HTTPStatus.OK,
+    response_model=RomancistaList,
+    response_model_exclude_unset=True,
+)
+async def retorna_romancista_por_nome(
+    engine: ReadEngine,
+    romancista_filter: FilterRomancistas,
+    response: Response,
+    if_none_match: IfNoneMatch = None,
+):
+    etag, content = await singleflight.do(
+        'romancistas',
+        (engine, romancista_filter.model_dump_json()),
+        lambda: with_session(engine, _lista_romancistas, romancista_filter),
+    )
+
+    if etag_matches(if_none_match, etag):
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED, headers={'ETag': etag}
         )
 
-    romancistas = query.all()
+    if settings.FAST_JSON:
+        return FastJSONResponse(content, headers={'ETag': etag})
+
+    response.headers['ETag'] = etag
 
-    return {'romancistas': romancistas}
+    return content
 
 
 @router.post(
@@ -74,20 +372,19 @@ async def cria_romancista(
     current_conta: CurrentConta,
 ):
     db_romancista = await session.scalar(
-        select(Romancista).where(Romancista.nome == romancista.nome)
+        dialect_insert(session, Romancista)
+        .values(nome=sanitize_str(romancista.nome))
+        .on_conflict_do_nothing(index_elements=['nome'])
+        .returning(Romancista)
     )
 
-    if db_romancista:
+    if not db_romancista:
         raise HTTPException(
             status_code=HTTPStatus.CONFLICT, detail='Romancista já existe.'
         )
 
-    nome_romancista_sanitized = sanitize_str(romancista.nome)
-    db_romancista = Romancista(nome=nome_romancista_sanitized)
-
-    session.add(db_romancista)
+    await ajusta_estatisticas(session, totais={'romancistas': 1})
     await session.commit()
-    await session.refresh(db_romancista)
 
     return db_romancista
 
@@ -100,18 +397,45 @@ async def deleta_romancista(
     session: Session,  # type: ignore
     current_conta: CurrentConta,
 ):
-    db_romancista = await session.scalar(
-        select(Romancista).where(Romancista.id == romancista_id)
+    # FOR UPDATE conflicts with the key-share lock that inserting a book
+    # takes on its novelist, so the books selected below stay exact.
+    db_romancista_id = await session.scalar(
+        select(Romancista.id)
+        .where(Romancista.id == romancista_id)
+        .with_for_update()
     )
 
-    if not db_romancista:
+    if not db_romancista_id:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail='Romancista não encontrada no MADR.',
         )
 
-    await session.delete(db_romancista)
+    livros_por_ano = dict(
+        (
+            await session.execute(
+                select(Livro.ano, -func.count())
+                .where(Livro.romancista_id == romancista_id)
+                .group_by(Livro.ano)
+            )
+        )
+        .tuples()
+        .all()
+    )
+
+    await session.execute(
+        delete(Romancista).where(Romancista.id == romancista_id)
+    )
+    await ajusta_estatisticas(
+        session,
+        por_ano=livros_por_ano,
+        totais={'romancistas': -1},
+    )
     await session.commit()
+    await entity_cache.invalidate(f'romancista:{romancista_id}')
+    # Cached books are filled under their novelist's scope, so one write
+    # drops them all, however many books the novelist had.
+    await entity_cache.invalidate_scope(f'romancista:{romancista_id}')
 
     return {'message': 'Romancista deletada do MADR.'}
 
@@ -127,9 +451,21 @@ async def atualiza_romancista(
     session: Session,  # type: ignore
     current_conta: CurrentConta,
 ):
-    db_romancista = await session.scalar(
-        select(Romancista).where(Romancista.id == romancista_id)
-    )
+    try:
+        db_romancista = await session.scalar(
+            update(Romancista)
+            .where(Romancista.id == romancista_id)
+            .values(
+                nome=sanitize_str(romancista.nome),
+                versao=Romancista.versao + 1,
+            )
+            .returning(Romancista)
+        )
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(
+            status_code=HTTPStatus.CONFLICT, detail='Romancista já existe.'
+        )
 
     if not db_romancista:
         raise HTTPException(
@@ -137,10 +473,7 @@ async def atualiza_romancista(
             detail='Romancista não encontrada no MADR.',
         )
 
-    db_romancista.nome = sanitize_str(romancista.nome)
-
-    session.add(db_romancista)
     await session.commit()
-    await session.refresh(db_romancista)
+    await entity_cache.invalidate(f'romancista:{romancista_id}')
 
     return db_romancista
@@ -0,0 +1,91 @@
+from http import HTTPStatus
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.database import get_read_session
+from madr.models import LivrosPorAno, LivrosPorRomancista, TotalCatalogo
+from madr.schemas import (
+    EstatisticasCatalogo,
+    FilterPage,
+    LivrosPorAnoList,
+    LivrosPorRomancistaList,
+    LivrosPorRomancistaPublic,
+)
+
+router = APIRouter(prefix='/stats', tags=['stats'])
+
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
+FilterStats = Annotated[FilterPage, Query()]
+
+
+@router.get('', status_code=HTTPStatus.OK, response_model=EstatisticasCatalogo)
+async def retorna_totais(session: ReadSession):  # type: ignore
+    totais = (
+        await session.execute(
+            select(
+                select(func.coalesce(func.sum(LivrosPorAno.total), 0))
+                .scalar_subquery()
+                .label('livros'),
+                select(TotalCatalogo.total)
+                .where(TotalCatalogo.nome == 'romancistas')
+                .scalar_subquery()
+                .label('romancistas'),
+            )
+        )
+    ).one()
+
+    return {'livros': totais.livros, 'romancistas': totais.romancistas or 0}
+
+
+@router.get(
+    '/anos', status_code=HTTPStatus.OK, response_model=LivrosPorAnoList
+)
+async def retorna_livros_por_ano(session: ReadSession):  # type: ignore
+    anos = await session.execute(
+        select(LivrosPorAno.ano, LivrosPorAno.total)
+        .where(LivrosPorAno.total > 0)
+        .order_by(LivrosPorAno.ano)
+    )
+
+    return {'anos': anos.mappings().all()}
+
+
+@router.get(
+    '/romancistas',
+    status_code=HTTPStatus.OK,
+    response_model=LivrosPorRomancistaList,
+)
+async def retorna_livros_por_romancista(
+    session: ReadSession,  # type: ignore
+    page: FilterStats,
+):
+    romancistas = await session.execute(
+        select(LivrosPorRomancista.romancista_id, LivrosPorRomancista.total)
+        .where(LivrosPorRomancista.total > 0)
+        .order_by(LivrosPorRomancista.romancista_id)
+        .limit(page.limit)
+        .offset(page.offset)
+    )
+
+    return {'romancistas': romancistas.mappings().all()}
+
+
+@router.get(
+    '/romancistas/{romancista_id}',
+    status_code=HTTPStatus.OK,
+    response_model=LivrosPorRomancistaPublic,
+)
+async def retorna_livros_do_romancista(
+    romancista_id: int,
+    session: ReadSession,  # type: ignore
+):
+    total = await session.scalar(
+        select(LivrosPorRomancista.total).where(
+            LivrosPorRomancista.romancista_id == romancista_id
+        )
+    )
+
+    return {'romancista_id': romancista_id, 'total': total or 0}
@@ -1,4 +1,17 @@
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from typing import Annotated, Literal
+
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    EmailStr,
+    Field,
+    model_validator,
+)
+
+# Ids are bound as Postgres integer (int4) arrays.
+MAX_ID = 2**31 - 1
+
+Id = Annotated[int, Field(ge=1, le=MAX_ID)]
 
 
 class Message(BaseModel):
@@ -40,8 +53,26 @@ class LivroPublic(LivroSchema):
     romancista_id: int
 
 
+class LivroExpandido(LivroPublic):
+    romancista: 'RomancistaPublic | None' = None
+
+
 class LivroList(BaseModel):
-    livros: list[LivroPublic]
+    livros: list[LivroExpandido]
+    next_cursor: str | None = None
+    ausentes: list[int] | None = None
+
+
+class LivroBulkItem(BaseModel):
+    index: int
+    status: Literal['criado', 'conflito', 'romancista_inexistente', 'invalido']
+    id: int | None = None
+    detail: str | None = None
+
+
+class LivroBulkResult(BaseModel):
+    criados: int
+    resultados: list[LivroBulkItem]
 
 
 class FilterPage(BaseModel):
@@ -54,6 +85,39 @@ class LivroFilter(BaseModel):
     ano: int | None = None
     limit: int = Field(ge=0, default=10)
     offset: int = Field(ge=0, default=0)
+    cursor: str | None = None
+    order_by: Literal['id', 'ano'] = 'id'
+    expand: Literal['romancista'] | None = None
+    ids: str | None = Field(default=None, pattern=r'^\d+(,\d+)*$')
+
+    @model_validator(mode='after')
+    def ids_exclusivos(self):
+        if self.ids is None:
+            return self
+
+        if not all(0 < int(value) <= MAX_ID for value in self.ids.split(',')):
+            raise ValueError(f'ids devem estar entre 1 e {MAX_ID}.')
+
+        # FastAPI passes every default in, so model_fields_set would
+        # report all of them; compare against the defaults instead.
+        combinados = [
+            name
+            for name, field in type(self).model_fields.items()
+            if name not in {'ids', 'expand'}
+            and getattr(self, name) != field.default
+        ]
+        if combinados:
+            raise ValueError(f'ids não combina com {", ".join(combinados)}.')
+
+        return self
+
+
+class RomancistaFilter(BaseModel):
+    romancista_nome: str | None = None
+    limit: int | None = 10
+    offset: int = 0
+    cursor: str | None = None
+    totais: bool = False
 
 
 class RomancistaSchema(BaseModel):
@@ -65,5 +129,60 @@ class RomancistaPublic(BaseModel):
     nome: str
 
 
+class RomancistaResumo(RomancistaPublic):
+    total_livros: int | None = None
+    primeiro_ano: int | None = None
+    ultimo_ano: int | None = None
+
+
 class RomancistaList(BaseModel):
-    romancistas: list[RomancistaPublic]
+    romancistas: list[RomancistaResumo]
+    next_cursor: str | None = None
+    ausentes: list[int] | None = None
+
+
+class IdsBatch(BaseModel):
+    ids: list[Id] = Field(min_length=1)
+
+
+class PoolStatus(BaseModel):
+    pool: str
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    checkouts: int
+    waits: int
+    wait_time_total: float
+    wait_time_max: float
+
+
+class CacheStatus(BaseModel):
+    backend: str
+    hits: int
+    misses: int
+    hit_ratio: float
+    lookup_time_avg: float
+
+
+class EstatisticasCatalogo(BaseModel):
+    livros: int
+    romancistas: int
+
+
+class LivrosPorAnoPublic(BaseModel):
+    ano: int
+    total: int
+
+
+class LivrosPorAnoList(BaseModel):
+    anos: list[LivrosPorAnoPublic]
+
+
+class LivrosPorRomancistaPublic(BaseModel):
+    romancista_id: int
+    total: int
+
+
+class LivrosPorRomancistaList(BaseModel):
+    romancistas: list[LivrosPorRomancistaPublic]
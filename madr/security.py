@@ -1,4 +1,13 @@
+import asyncio
+import time
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from hashlib import sha256
 from http import HTTPStatus
 from typing import Annotated
 from zoneinfo import ZoneInfo
@@ -10,7 +19,9 @@ from pwdlib import PasswordHash
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from madr.cache import TTLCache
 from madr.database import get_session
+from madr.metrics import password_hash_duration
 from madr.models import Conta
 from madr.settings import Settings
 
@@ -22,6 +33,26 @@ oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl='/auth/token', refreshUrl='/auth/refresh_token'
 )
 
+_hash_executor: Executor | None = None
+_hash_pending = 0
+# A revoked token must stop working on every worker at once, and this
+# cache lives in one process, so it is only used with a single worker.
+_token_versions = TTLCache(
+    maxsize=(
+        settings.TOKEN_VERSION_CACHE_SIZE
+        if settings.SERVER_WORKERS == 1
+        else 0
+    ),
+    ttl=settings.TOKEN_VERSION_CACHE_SECONDS,
+)
+_token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE)
+
+
+@dataclass(frozen=True, slots=True)
+class ContaPrincipal:
+    id: int
+    email: str
+
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -37,6 +68,16 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 
+def create_conta_token(conta: Conta):
+    return create_access_token(
+        data={
+            'sub': conta.email,
+            'id': conta.id,
+            'ver': conta.token_version,
+        }
+    )
+
+
 def get_password_hash(password: str):
     return pwd_context.hash(password)
 
@@ -45,36 +86,149 @@ def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
 
-async def get_current_conta(
-    session: Session,
-    token: str = Depends(oauth2_scheme),
-):
-    credentials_exception = HTTPException(
+def get_hash_executor() -> Executor:
+    global _hash_executor  # noqa: PLW0603
+
+    if _hash_executor is None:
+        if settings.HASH_EXECUTOR == 'process':
+            _hash_executor = ProcessPoolExecutor(
+                max_workers=settings.HASH_WORKERS
+            )
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=settings.HASH_WORKERS,
+                thread_name_prefix='madr-hash',
+            )
+
+    return _hash_executor
+
+
+def shutdown_hash_executor():
+    global _hash_executor  # noqa: PLW0603
+
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True)
+        _hash_executor = None
+
+
+async def _run_in_hash_executor(func, *args):
+    global _hash_pending  # noqa: PLW0603
+
+    if _hash_pending >= settings.HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail='Servidor ocupado, tente novamente.',
+            headers={'Retry-After': '1'},
+        )
+
+    _hash_pending += 1
+    start = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_hash_executor(), func, *args)
+    finally:
+        _hash_pending -= 1
+        if settings.METRICS_ENABLED:
+            password_hash_duration.observe(
+                time.perf_counter() - start, func.__name__
+            )
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_in_hash_executor(get_password_hash, password)
+
+
+async def verify_password_async(
+    plain_password: str, hashed_password: str
+) -> bool:
+    return await _run_in_hash_executor(
+        verify_password, plain_password, hashed_password
+    )
+
+
+def _credentials_exception():
+    return HTTPException(
         status_code=HTTPStatus.UNAUTHORIZED,
         detail='Não foi possível validar as credenciais.',
         headers={'WWW-Authenticate': 'Bearer'},
     )
 
+
+def _decode_token(token: str) -> dict:
+    token_digest = sha256(token.encode()).digest()
+    payload = _token_cache.get(token_digest)
+
+    if payload is not None:
+        return payload
+
     try:
         payload = decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
         )
-        subject_email = payload.get('sub')
+    except (DecodeError, ExpiredSignatureError):
+        raise _credentials_exception()
+
+    if not payload.get('sub') or 'id' not in payload or 'ver' not in payload:
+        raise _credentials_exception()
+
+    _token_cache.set(token_digest, payload, expires_at=payload['exp'])
+
+    return payload
+
+
+async def get_token_version(session: AsyncSession, conta_id: int):
+    token_version = _token_versions.get(conta_id)
+    if token_version is not None:
+        return token_version
+
+    token_version = await session.scalar(
+        select(Conta.token_version).where(Conta.id == conta_id)
+    )
+
+    if token_version is not None:
+        _token_versions.set(conta_id, token_version)
+
+    return token_version
 
-        if not subject_email:
-            raise credentials_exception
 
-    except DecodeError:
-        raise credentials_exception
+def forget_token_version(conta_id: int):
+    _token_versions.delete(conta_id)
 
-    except ExpiredSignatureError:
-        raise credentials_exception
+
+def clear_token_versions():
+    _token_versions.clear()
+    _token_cache.clear()
+
+
+async def get_current_principal(
+    session: Session,
+    token: str = Depends(oauth2_scheme),
+) -> ContaPrincipal:
+    payload = _decode_token(token)
+
+    token_version = await get_token_version(session, payload['id'])
+
+    if token_version is None or token_version != payload['ver']:
+        raise _credentials_exception()
+
+    return ContaPrincipal(id=payload['id'], email=payload['sub'])
+
+
+async def get_current_conta(
+    session: Session,
+    token: str = Depends(oauth2_scheme),
+):
+    payload = _decode_token(token)
 
     conta = await session.scalar(
-        select(Conta).where(Conta.email == subject_email)
+        select(Conta).where(Conta.id == payload['id'])
     )
 
-    if not conta:
-        raise credentials_exception
+    if (
+        not conta
+        or conta.email != payload['sub']
+        or conta.token_version != payload['ver']
+    ):
+        raise _credentials_exception()
 
     return conta
@@ -0,0 +1,52 @@
+import uvicorn
+
+from madr.settings import Settings
+
+
+def server_options(settings: Settings) -> dict:
+    # Each worker would keep its own in-memory entity cache, and a write
+    # only clears the one in the worker that handled it.
+    if (
+        settings.SERVER_WORKERS > 1
+        and not settings.CACHE_URL
+        and settings.CACHE_SIZE > 0
+    ):
+        raise ValueError(
+            'SERVER_WORKERS > 1 exige CACHE_URL (cache compartilhado) '
+            'ou CACHE_SIZE=0.'
+        )
+
+    # Likewise each worker counts only the requests it served, so without
+    # a shared snapshot directory a scrape sees whichever one answered.
+    if (
+        settings.SERVER_WORKERS > 1
+        and settings.METRICS_ENABLED
+        and not settings.METRICS_DIR
+    ):
+        raise ValueError(
+            'SERVER_WORKERS > 1 exige METRICS_DIR (diretório compartilhado) '
+            'ou METRICS_ENABLED=false.'
+        )
+
+    return {
+        'host': settings.SERVER_HOST,
+        'port': settings.SERVER_PORT,
+        'workers': settings.SERVER_WORKERS,
+        'loop': settings.SERVER_LOOP,
+        'http': settings.SERVER_HTTP,
+        'timeout_keep_alive': settings.SERVER_KEEPALIVE_SECONDS,
+        'backlog': settings.SERVER_BACKLOG,
+        'limit_concurrency': settings.SERVER_LIMIT_CONCURRENCY,
+        'limit_max_requests': settings.SERVER_MAX_REQUESTS,
+        'timeout_graceful_shutdown': settings.SERVER_GRACEFUL_TIMEOUT,
+        'proxy_headers': True,
+        'access_log': False,
+    }
+
+
+def main():  # pragma: no cover
+    uvicorn.run('madr.app:app', **server_options(Settings()))  # type: ignore
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
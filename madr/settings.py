@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -10,3 +12,56 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+
+    HASH_EXECUTOR: Literal['thread', 'process'] = 'thread'
+    HASH_WORKERS: int = 2
+    HASH_MAX_PENDING: int = 32
+
+    TOKEN_VERSION_CACHE_SECONDS: int = 30
+    TOKEN_VERSION_CACHE_SIZE: int = 4096
+    TOKEN_CACHE_SIZE: int = 4096
+
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = -1
+    DB_POOL_PRE_PING: bool = False
+    DB_STATEMENT_TIMEOUT_MS: int | None = None
+    DB_PREPARE_THRESHOLD: int | None = 5
+
+    DATABASE_REPLICA_URLS: list[str] = []
+    DB_REPLICA_STRATEGY: Literal['round_robin', 'least_connections'] = (
+        'round_robin'
+    )
+    READ_YOUR_WRITES_SECONDS: int = 5
+
+    LIVRO_BULK_MAX_ITEMS: int = 10_000
+
+    EXPORT_CHUNK_SIZE: int = 1000
+
+    BATCH_MAX_IDS: int = 5000
+
+    FAST_JSON: bool = False
+
+    CACHE_URL: str | None = None
+    CACHE_SIZE: int = 10_000
+    CACHE_TTL_SECONDS: int = 300
+    CACHE_INVALIDATION_HOLD_SECONDS: float = 5
+
+    SLOW_QUERY_MS: float = 200
+    QUERY_LOG_SLOWEST: int = 3
+
+    METRICS_ENABLED: bool = True
+    METRICS_DIR: str | None = None
+    METRICS_FLUSH_SECONDS: float = 5
+
+    SERVER_HOST: str = '0.0.0.0'
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 1
+    SERVER_LOOP: Literal['auto', 'asyncio', 'uvloop'] = 'auto'
+    SERVER_HTTP: Literal['auto', 'h11', 'httptools'] = 'auto'
+    SERVER_KEEPALIVE_SECONDS: int = 5
+    SERVER_BACKLOG: int = 2048
+    SERVER_LIMIT_CONCURRENCY: int | None = None
+    SERVER_MAX_REQUESTS: int | None = None
+    SERVER_GRACEFUL_TIMEOUT: int | None = 30
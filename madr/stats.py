@@ -0,0 +1,91 @@
+from collections import Counter
+from collections.abc import Iterable
+
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from madr.database import dialect_insert
+from madr.models import (
+    Livro,
+    LivrosPorAno,
+    LivrosPorRomancista,
+    Romancista,
+    TotalCatalogo,
+)
+
+
+async def _incrementa(session: AsyncSession, entity, key: str, deltas: dict):
+    deltas = {chave: delta for chave, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    insert = dialect_insert(session, entity).values([
+        {key: chave, 'total': delta} for chave, delta in sorted(deltas.items())
+    ])
+    await session.execute(
+        insert.on_conflict_do_update(
+            index_elements=[key],
+            set_={'total': entity.total + insert.excluded.total},
+        )
+    )
+
+
+async def ajusta_estatisticas(
+    session: AsyncSession,
+    *,
+    por_ano: dict[int, int] | None = None,
+    por_romancista: dict[int, int] | None = None,
+    totais: dict[str, int] | None = None,
+):
+    await _incrementa(session, LivrosPorAno, 'ano', por_ano or {})
+    await _incrementa(
+        session, LivrosPorRomancista, 'romancista_id', por_romancista or {}
+    )
+    await _incrementa(session, TotalCatalogo, 'nome', totais or {})
+
+
+async def registra_livros(
+    session: AsyncSession,
+    criados: Iterable[tuple[int, int]] = (),
+    removidos: Iterable[tuple[int, int]] = (),
+):
+    por_ano = Counter()
+    por_romancista = Counter()
+    for livros, sinal in ((criados, 1), (removidos, -1)):
+        for ano, romancista_id in livros:
+            por_ano[ano] += sinal
+            por_romancista[romancista_id] += sinal
+
+    # The book total is the sum of livros_por_ano, so book writes do not
+    # all queue on one totais_catalogo row lock.
+    await ajusta_estatisticas(
+        session, por_ano=por_ano, por_romancista=por_romancista
+    )
+
+
+async def recalcula_estatisticas(conn: AsyncConnection):
+    for entity in (LivrosPorAno, LivrosPorRomancista, TotalCatalogo):
+        await conn.execute(delete(entity))
+
+    await conn.execute(
+        insert(LivrosPorAno).from_select(
+            ['ano', 'total'],
+            select(Livro.ano, func.count()).group_by(Livro.ano),
+        )
+    )
+    await conn.execute(
+        insert(LivrosPorRomancista).from_select(
+            ['romancista_id', 'total'],
+            select(Livro.romancista_id, func.count()).group_by(
+                Livro.romancista_id
+            ),
+        )
+    )
+    await conn.execute(
+        insert(TotalCatalogo).from_select(
+            ['nome', 'total'],
+            select(literal('romancistas'), func.count()).select_from(
+                Romancista
+            ),
+        )
+    )
@@ -0,0 +1,36 @@
+"""versao em livros e romancistas
+
+Revision ID: 0c6a5d93e7f4
+Revises: e3b9f0d27c51
+Create Date: 2026-10-18 11:25:13.840372
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c6a5d93e7f4'
+down_revision: Union[str, Sequence[str], None] = 'e3b9f0d27c51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'livros',
+        sa.Column('versao', sa.Integer(), server_default='1', nullable=False),
+    )
+    op.add_column(
+        'romancistas',
+        sa.Column('versao', sa.Integer(), server_default='1', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('romancistas', 'versao')
+    op.drop_column('livros', 'versao')
@@ -0,0 +1,31 @@
+"""total de livros a partir de livros_por_ano
+
+Revision ID: 2a9e6c1f5d83
+Revises: f19c2e8d4b70
+Create Date: 2026-10-18 21:12:40.518273
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2a9e6c1f5d83'
+down_revision: Union[str, Sequence[str], None] = 'f19c2e8d4b70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("DELETE FROM totais_catalogo WHERE nome = 'livros'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        'INSERT INTO totais_catalogo (nome, total) '
+        "SELECT 'livros', count(*) FROM livros"
+    )
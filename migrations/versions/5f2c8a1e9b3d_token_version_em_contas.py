@@ -0,0 +1,33 @@
+"""token_version em contas
+
+Revision ID: 5f2c8a1e9b3d
+Revises: c1dd63d7c47b
+Create Date: 2026-10-18 09:12:31.504211
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f2c8a1e9b3d'
+down_revision: Union[str, Sequence[str], None] = 'c1dd63d7c47b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'contas',
+        sa.Column(
+            'token_version', sa.Integer(), server_default='0', nullable=False
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('contas', 'token_version')
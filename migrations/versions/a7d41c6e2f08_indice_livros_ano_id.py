@@ -0,0 +1,28 @@
+"""indice livros (ano, id) para paginacao por cursor
+
+Revision ID: a7d41c6e2f08
+Revises: 5f2c8a1e9b3d
+Create Date: 2026-10-18 10:02:47.118930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d41c6e2f08'
+down_revision: Union[str, Sequence[str], None] = '5f2c8a1e9b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_livros_ano_id', 'livros', ['ano', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_livros_ano_id', table_name='livros')
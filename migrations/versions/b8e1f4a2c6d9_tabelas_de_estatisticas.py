@@ -0,0 +1,64 @@
+"""tabelas de estatisticas
+
+Revision ID: b8e1f4a2c6d9
+Revises: 0c6a5d93e7f4
+Create Date: 2026-10-18 14:02:47.215309
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e1f4a2c6d9'
+down_revision: Union[str, Sequence[str], None] = '0c6a5d93e7f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'livros_por_ano',
+        sa.Column('ano', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('ano'),
+    )
+    op.create_table(
+        'livros_por_romancista',
+        sa.Column('romancista_id', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['romancista_id'], ['romancistas.id'], ondelete='CASCADE'
+        ),
+        sa.PrimaryKeyConstraint('romancista_id'),
+    )
+    op.create_table(
+        'totais_catalogo',
+        sa.Column('nome', sa.String(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('nome'),
+    )
+
+    op.execute(
+        'INSERT INTO livros_por_ano (ano, total) '
+        'SELECT ano, count(*) FROM livros GROUP BY ano'
+    )
+    op.execute(
+        'INSERT INTO livros_por_romancista (romancista_id, total) '
+        'SELECT romancista_id, count(*) FROM livros GROUP BY romancista_id'
+    )
+    op.execute(
+        "INSERT INTO totais_catalogo (nome, total) "
+        "SELECT 'livros', count(*) FROM livros "
+        "UNION ALL SELECT 'romancistas', count(*) FROM romancistas"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('totais_catalogo')
+    op.drop_table('livros_por_romancista')
+    op.drop_table('livros_por_ano')
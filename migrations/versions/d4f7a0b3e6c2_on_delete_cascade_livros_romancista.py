@@ -0,0 +1,46 @@
+"""on delete cascade livros -> romancista
+
+Revision ID: d4f7a0b3e6c2
+Revises: b8e1f4a2c6d9
+Create Date: 2026-10-18 15:10:32.584117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f7a0b3e6c2'
+down_revision: Union[str, Sequence[str], None] = 'b8e1f4a2c6d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_constraint(
+        'livros_romancista_id_fkey', 'livros', type_='foreignkey'
+    )
+    op.create_foreign_key(
+        'livros_romancista_id_fkey',
+        'livros',
+        'romancistas',
+        ['romancista_id'],
+        ['id'],
+        ondelete='CASCADE',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint(
+        'livros_romancista_id_fkey', 'livros', type_='foreignkey'
+    )
+    op.create_foreign_key(
+        'livros_romancista_id_fkey',
+        'livros',
+        'romancistas',
+        ['romancista_id'],
+        ['id'],
+    )
@@ -0,0 +1,49 @@
+"""indices trigram em livros.titulo e romancistas.nome
+
+Revision ID: e3b9f0d27c51
+Revises: a7d41c6e2f08
+Create Date: 2026-10-18 10:41:05.372614
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b9f0d27c51'
+down_revision: Union[str, Sequence[str], None] = 'a7d41c6e2f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index(
+        'ix_livros_titulo_trgm',
+        'livros',
+        ['titulo'],
+        postgresql_using='gin',
+        postgresql_ops={'titulo': 'gin_trgm_ops'},
+    )
+    op.create_index(
+        'ix_romancistas_nome_trgm',
+        'romancistas',
+        ['nome'],
+        postgresql_using='gin',
+        postgresql_ops={'nome': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.drop_index('ix_romancistas_nome_trgm', table_name='romancistas')
+    op.drop_index('ix_livros_titulo_trgm', table_name='livros')
@@ -0,0 +1,32 @@
+"""indice livros romancista_id ano
+
+Revision ID: f19c2e8d4b70
+Revises: d4f7a0b3e6c2
+Create Date: 2026-10-18 15:48:06.331942
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f19c2e8d4b70'
+down_revision: Union[str, Sequence[str], None] = 'd4f7a0b3e6c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_livros_romancista_id_ano',
+        'livros',
+        ['romancista_id', 'ano'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_livros_romancista_id_ano', table_name='livros')
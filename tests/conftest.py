@@ -5,30 +5,51 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from testcontainers.postgres import PostgresContainer
 
 from madr.app import app
-from madr.database import get_session
+from madr.cache import entity_cache
+from madr.database import (
+    QueryCounter,
+    get_read_engine,
+    get_read_session,
+    get_session,
+    instrument_engine,
+)
 from madr.models import Conta, Livro, Romancista, table_registry
-from madr.security import get_password_hash
+from madr.security import clear_token_versions, get_password_hash
+from madr.stats import ajusta_estatisticas, registra_livros
 
 
 @pytest_asyncio.fixture
-async def client(session):
+async def client(engine, session):
     def get_session_override():
         return session
 
+    def get_read_engine_override():
+        return engine
+
     with TestClient(app) as client:
         app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        app.dependency_overrides[get_read_engine] = get_read_engine_override
         yield client
 
     app.dependency_overrides.clear()
+    clear_token_versions()
+    await entity_cache.clear()
 
 
 @pytest.fixture(scope='session')
 def engine():
     with PostgresContainer('postgres:16', driver='psycopg') as postgres:
         _engine = create_async_engine(postgres.get_connection_url())
+        instrument_engine(_engine)
         yield _engine
 
 
+@pytest.fixture
+def queries(engine):
+    return QueryCounter(engine)
+
+
 @pytest_asyncio.fixture
 async def session(engine):
     async with engine.begin() as conn:
@@ -75,6 +96,7 @@ async def romancista(session):
     romancista = Romancista(nome='hermann hesse')
 
     session.add(romancista)
+    await ajusta_estatisticas(session, totais={'romancistas': 1})
     await session.commit()
     await session.refresh(romancista)
 
@@ -88,6 +110,7 @@ async def livro(session, romancista):
     )
 
     session.add(livro)
+    await registra_livros(session, criados=[(livro.ano, romancista.id)])
     await session.commit()
     await session.refresh(livro)
 
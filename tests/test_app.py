@@ -1,8 +1,12 @@
+import json
+import logging
 from http import HTTPStatus
 
+import pytest
 from fastapi.testclient import TestClient
 
 from madr.app import app
+from madr.database import PRIMARY_COOKIE
 
 
 def test_app_retorna_ola_mundo():
@@ -11,3 +15,72 @@ def test_app_retorna_ola_mundo():
 
     assert response.status_code == HTTPStatus.OK
     assert response.json() == {'message': 'Olá mundo!'}
+
+
+def test_server_timing_conta_consultas(client, livro):
+    response = client.get('/livro/')
+
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+    assert 'desc="1 queries"' in response.headers['Server-Timing']
+
+
+def test_registra_consulta_lenta(client, livro, caplog, monkeypatch):
+    monkeypatch.setattr('madr.database.settings.SLOW_QUERY_MS', 0)
+
+    with caplog.at_level(logging.WARNING, logger='madr.sql'):
+        client.get('/livro/')
+
+    evento = json.loads(caplog.records[0].getMessage())
+
+    assert evento['event'] == 'slow_query'
+    assert evento['statement'].startswith('SELECT')
+
+
+def test_registra_requisicao(client, livro, caplog):
+    with caplog.at_level(logging.INFO, logger='madr.request'):
+        client.get('/livro/1')
+
+    evento = json.loads(caplog.records[-1].getMessage())
+
+    assert evento['path'] == '/livro/1'
+    assert evento['db_queries'] == len(evento['slowest'])
+
+
+def test_health_retorna_ok(client):
+    response = client.get('/health')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {'message': 'ok'}
+
+
+def test_health_ready_consulta_banco(client, queries):
+    with queries:
+        response = client.get('/health/ready')
+
+    assert response.status_code == HTTPStatus.OK
+    assert queries.statements == ['SELECT 1']
+
+
+def test_escrita_marca_leitura_no_primario(client, token, monkeypatch):
+    monkeypatch.setattr(
+        'madr.app.settings.DATABASE_REPLICA_URLS',
+        ['sqlite+aiosqlite:///replica.db'],
+    )
+
+    escrita = client.post(
+        '/romancista/',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'nome': 'clarice lispector'},
+    )
+    leitura = client.get('/romancista/')
+
+    assert escrita.cookies.get(PRIMARY_COOKIE) == '1'
+    assert PRIMARY_COOKIE not in leitura.headers.get('set-cookie', '')
+
+
+def test_fast_json_sem_orjson_impede_inicializacao(monkeypatch):
+    monkeypatch.setattr('madr.app.settings.FAST_JSON', True)
+    monkeypatch.setattr('madr.responses.orjson', None)
+
+    with pytest.raises(RuntimeError, match='orjson'), TestClient(app):
+        pass
@@ -0,0 +1,218 @@
+from fnmatch import fnmatch
+from http import HTTPStatus
+
+import pytest
+from freezegun import freeze_time
+
+from madr.cache import (
+    EntityCache,
+    MemoryBackend,
+    RedisBackend,
+    TTLCache,
+    entity_cache,
+    invalidation_hold,
+)
+from madr.settings import Settings
+
+
+def test_ttl_cache_get_set():
+    cache = TTLCache(maxsize=2)
+    cache.set('a', 1)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_ttl_cache_remove_menos_usado():
+    cache = TTLCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert [cache.get(key) for key in ('a', 'b', 'c')] == [1, None, 3]
+
+
+def test_ttl_cache_expira():
+    cache = TTLCache(maxsize=2, ttl=60)
+
+    with freeze_time('2025-07-13 12:00:00'):
+        cache.set('a', 1)
+        cache.set('b', 2, expires_at=0)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+
+    with freeze_time('2025-07-13 12:01:01'):
+        assert cache.get('a') is None
+
+
+def test_ttl_cache_tamanho_zero_nao_armazena():
+    cache = TTLCache(maxsize=0)
+    cache.set('a', 1)
+
+    assert cache.get('a') is None
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None, px=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value.encode()
+        return True
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def exists(self, *keys):
+        return sum(key in self.data for key in keys)
+
+    async def scan_iter(self, match):
+        for key in list(self.data):
+            if fnmatch(key, match):
+                yield key
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+    def set(self, *args, **kwargs):
+        self.commands.append((args, kwargs))
+
+    async def execute(self):
+        return [
+            await self.client.set(*args, **kwargs)
+            for args, kwargs in self.commands
+        ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'backend',
+    [MemoryBackend(maxsize=10), RedisBackend(FakeRedis())],
+    ids=['memory', 'redis'],
+)
+async def test_entity_cache_backends(backend):
+    cache = EntityCache(backend)
+
+    await cache.set('livro:1', {'id': 1})
+    await cache.set('livro:2', {'id': 2})
+    await cache.set('romancista:1', {'id': 1})
+
+    assert await cache.get('livro:1') == {'id': 1}
+    assert await cache.get('livro:3') is None
+
+    await cache.invalidate('romancista:1', 'livro:2')
+
+    assert await cache.get('livro:1') == {'id': 1}
+    assert await cache.get('livro:2') is None
+    assert await cache.get('romancista:1') is None
+    assert (cache.hits, cache.misses) == (2, 3)
+    assert cache.status()['backend'] == backend.name
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'backend',
+    [MemoryBackend(maxsize=10), RedisBackend(FakeRedis())],
+    ids=['memory', 'redis'],
+)
+async def test_entity_cache_nao_repoe_valor_apos_invalidacao(backend):
+    cache = EntityCache(backend, hold_seconds=60)
+    await cache.set('livro:1', {'id': 1, 'titulo': 'antigo'})
+
+    # leitura que carregou o livro antes da escrita confirmar
+    carregado = {'id': 1, 'titulo': 'antigo'}
+    await cache.invalidate('livro:1')
+    await cache.set('livro:1', carregado)
+
+    assert await cache.get('livro:1') is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'backend',
+    [MemoryBackend(maxsize=2), RedisBackend(FakeRedis())],
+    ids=['memory', 'redis'],
+)
+async def test_entity_cache_invalida_escopo(backend):
+    cache = EntityCache(backend, ttl=60)
+    await cache.set('livro:1', {'id': 1}, scope='romancista:1')
+    await cache.set('livro:2', {'id': 2}, scope='romancista:2')
+
+    await cache.invalidate_scope('romancista:1')
+    # preenchimento atrasado de uma leitura anterior à invalidação
+    await cache.set('livro:3', {'id': 3}, scope='romancista:1')
+
+    assert await cache.get('livro:1') is None
+    assert await cache.get('livro:3') is None
+    assert await cache.get('livro:2') == {'id': 2}
+
+
+def test_retorna_livro_usa_cache_e_invalida(client, livro, token):
+    client.get('/livro/1')
+    client.get('/livro/1')
+
+    assert entity_cache.hits == 1
+
+    client.patch(
+        '/livro/1',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'ano': 1927, 'titulo': 'Steppenwolf', 'romancista_id': 1},
+    )
+
+    assert client.get('/livro/1').json()['titulo'] == 'steppenwolf'
+
+
+def test_deleta_romancista_invalida_livros(client, livro, token):
+    client.get('/livro/1')
+    client.delete(
+        '/romancista/1', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert client.get('/livro/1').status_code == HTTPStatus.NOT_FOUND
+
+
+def test_retorna_status_cache(client, livro):
+    client.get('/livro/1')
+    client.get('/livro/1')
+
+    response = client.get('/metrics/cache')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['hits'] == response.json()['misses']
+
+
+def test_invalidacao_cobre_atraso_das_replicas():
+    sem_replicas = Settings(CACHE_INVALIDATION_HOLD_SECONDS=1)
+    com_replicas = Settings(
+        CACHE_INVALIDATION_HOLD_SECONDS=1,
+        READ_YOUR_WRITES_SECONDS=10,
+        DATABASE_REPLICA_URLS=['postgresql+psycopg://replica/app'],
+    )
+
+    assert invalidation_hold(sem_replicas) == 1
+    assert (
+        invalidation_hold(com_replicas)
+        == com_replicas.READ_YOUR_WRITES_SECONDS
+    )
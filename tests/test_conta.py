@@ -1,5 +1,13 @@
+import asyncio
 from http import HTTPStatus
 
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.routers.conta import cria_conta
+from madr.schemas import ContaSchema
+
 
 def test_cria_conta_sucesso(client):
     response = client.post(
@@ -33,6 +41,31 @@ def test_cria_conta_usuario_ja_existe(client, conta):
     assert response.json() == {'detail': 'Conta já existe.'}
 
 
+@pytest.mark.asyncio
+async def test_cria_conta_concorrente(engine, session):
+    async def cria():
+        async with AsyncSession(engine, expire_on_commit=False) as nova:
+            try:
+                await cria_conta(
+                    ContaSchema(
+                        username='nebu',
+                        email='nebu@email.com',
+                        password='secrets',
+                    ),
+                    nova,
+                )
+            except HTTPException as exc:
+                return exc.status_code
+
+            return HTTPStatus.CREATED
+
+    resultados = await asyncio.gather(*(cria() for _ in range(10)))
+
+    assert (
+        sorted(resultados) == [HTTPStatus.CREATED] + [HTTPStatus.CONFLICT] * 9
+    )
+
+
 def test_cria_conta_email_ja_existe(client, conta):
     response = client.post(
         '/conta/',
@@ -238,3 +271,52 @@ def test_deleta_conta_nao_encontrada(client):
 
     assert response.status_code == HTTPStatus.UNAUTHORIZED
     assert response.json() == {'detail': 'Not authenticated'}
+
+
+def test_alterando_conta_invalida_token_antigo(client, conta, token):
+    client.put(
+        f'/conta/{conta.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={
+            'username': 'nebu',
+            'email': 'nebu@email.com',
+            'password': 'secret',
+        },
+    )
+
+    response = client.post(
+        '/romancista/',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'nome': 'Roberto Bolaño'},
+    )
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_deleta_conta_invalida_token(client, conta, token):
+    client.delete(
+        f'/conta/{conta.id}',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    response = client.post(
+        '/romancista/',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'nome': 'Roberto Bolaño'},
+    )
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_cria_conta_numero_de_consultas(client, queries):
+    with queries:
+        client.post(
+            '/conta/',
+            json={
+                'username': 'nebu',
+                'email': 'nebu@email.com',
+                'password': 'secrets',
+            },
+        )
+
+    assert queries.count == 1
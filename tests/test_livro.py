@@ -1,5 +1,19 @@
+import json
+import tracemalloc
 from http import HTTPStatus
 
+import pytest
+from sqlalchemy import insert, select
+
+from madr.export import export_response
+from madr.models import Livro, Romancista
+from madr.routers.livro import LIVRO_COLUMNS
+
+# verificação de token_version + o próprio comando de escrita
+CONSULTAS_POR_ESCRITA = 2
+# livros_por_ano e livros_por_romancista
+CONSULTAS_DE_ESTATISTICAS = 2
+
 
 def test_cria_livro(client, token, romancista):
     response = client.post(
@@ -82,6 +96,21 @@ def test_retorna_livros_por_nome(client, livro):
     assert response.status_code == HTTPStatus.OK
 
 
+def test_retorna_livros_por_titulo(client, livro):
+    response = client.get('/livro/?titulo=LOBO')
+
+    assert response.status_code == HTTPStatus.OK
+    assert [livro['titulo'] for livro in response.json()['livros']] == [
+        'o lobo da estepe'
+    ]
+
+
+def test_retorna_livros_por_titulo_escapa_curinga(client, livro):
+    response = client.get('/livro/?titulo=o_l')
+
+    assert response.json()['livros'] == []
+
+
 def test_retorna_livros_por_ano(client, livro):
     response = client.get(f'livro/?livro_ano={livro.ano}')
 
@@ -132,3 +161,462 @@ def test_atualiza_livro_not_found(client, token, romancista):
     )
 
     assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_retorna_livros_por_cursor_ano(client, session, romancista):
+    session.add_all([
+        Livro(ano=ano, titulo=titulo, romancista_id=romancista.id)
+        for ano, titulo in ((1943, 'c'), (1919, 'a'), (1927, 'b'))
+    ])
+    await session.commit()
+
+    primeira = client.get('/livro/?limit=2&order_by=ano').json()
+    segunda = client.get(
+        f'/livro/?limit=2&order_by=ano&cursor={primeira["next_cursor"]}'
+    ).json()
+
+    assert [livro['titulo'] for livro in primeira['livros']] == ['a', 'b']
+    assert [livro['titulo'] for livro in segunda['livros']] == ['c']
+    assert segunda['next_cursor'] is None
+
+
+def test_retorna_livro_expande_romancista(client, livro, romancista):
+    response = client.get(f'/livro/{livro.id}?expand=romancista')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'id': livro.id,
+        'ano': 1927,
+        'titulo': 'o lobo da estepe',
+        'romancista_id': romancista.id,
+        'romancista': {'id': romancista.id, 'nome': 'hermann hesse'},
+    }
+    assert 'romancista' not in client.get(f'/livro/{livro.id}').json()
+
+
+def test_retorna_livros_expande_romancista_etag_muda(
+    client, livro, romancista, token
+):
+    antes = client.get('/livro/?expand=romancista')
+    client.patch(
+        f'/romancista/{romancista.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'nome': 'Hesse'},
+    )
+    depois = client.get(
+        '/livro/?expand=romancista',
+        headers={'If-None-Match': antes.headers['ETag']},
+    )
+
+    assert depois.status_code == HTTPStatus.OK
+    assert depois.json()['livros'][0]['romancista']['nome'] == 'hesse'
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('quantidade', [1, 50])
+async def test_retorna_livros_expandidos_numero_de_consultas(
+    client, session, queries, quantidade
+):
+    romancistas = [Romancista(nome=f'romancista {i}') for i in range(10)]
+    session.add_all(romancistas)
+    await session.flush()
+    session.add_all([
+        Livro(
+            ano=1900 + i,
+            titulo=f'livro {i}',
+            romancista_id=romancistas[i % 10].id,
+        )
+        for i in range(quantidade)
+    ])
+    await session.commit()
+
+    with queries:
+        response = client.get(f'/livro/?expand=romancista&limit={quantidade}')
+
+    livros = response.json()['livros']
+    assert len(livros) == quantidade
+    assert all(livro['romancista']['nome'] for livro in livros)
+    assert queries.count == 1
+
+
+def test_leituras_nao_carregam_entidades(client, session, livro):
+    session.expunge_all()
+
+    client.get(f'/livro/{livro.id}')
+    client.get('/livro/')
+
+    assert len(session.identity_map) == 0
+
+
+def test_retorna_livros_json_rapido(client, livro, monkeypatch):
+    padrao = client.get('/livro/?limit=1')
+    monkeypatch.setattr('madr.routers.livro.settings.FAST_JSON', True)
+    rapido = client.get('/livro/?limit=1')
+
+    assert rapido.status_code == HTTPStatus.OK
+    assert rapido.json() == padrao.json()
+    assert rapido.headers['ETag'] == padrao.headers['ETag']
+
+
+def test_retorna_livros_cursor_invalido(client):
+    response = client.get('/livro/?cursor=W10')
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json() == {'detail': 'Cursor inválido.'}
+
+
+def test_cria_livros_em_lote(client, token, livro, romancista):
+    response = client.post(
+        '/livro/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json=[
+            {'ano': 1922, 'titulo': 'Sidarta', 'romancista_id': 1},
+            {'ano': 1927, 'titulo': 'O Lobo da Estepe', 'romancista_id': 1},
+            {'ano': 1922, 'titulo': 'sidarta', 'romancista_id': 1},
+            {'ano': 1943, 'titulo': 'O Jogo das Contas', 'romancista_id': 2},
+            {'ano': 1919, 'titulo': 'Demian'},
+        ],
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'criados': 1,
+        'resultados': [
+            {'index': 0, 'status': 'criado', 'id': 2, 'detail': None},
+            {
+                'index': 1,
+                'status': 'conflito',
+                'id': None,
+                'detail': 'Livro já existente.',
+            },
+            {
+                'index': 2,
+                'status': 'conflito',
+                'id': None,
+                'detail': 'Livro já existente.',
+            },
+            {
+                'index': 3,
+                'status': 'romancista_inexistente',
+                'id': None,
+                'detail': 'Romancista não consta no MADR.',
+            },
+            {
+                'index': 4,
+                'status': 'invalido',
+                'id': None,
+                'detail': 'Field required',
+            },
+        ],
+    }
+
+
+def test_cria_livros_em_lote_ndjson(client, token, romancista):
+    response = client.post(
+        '/livro/bulk',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/x-ndjson',
+        },
+        content=(
+            '{"ano": 1922, "titulo": "Sidarta", "romancista_id": 1}\n'
+            '\n'
+            '{"ano": 1919, "titulo": "Demian", "romancista_id": 1}\n'
+        ),
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['criados'] == len(['sidarta', 'demian'])
+    assert client.get('/livro/2').json()['titulo'] == 'demian'
+
+
+def test_cria_livros_em_lote_corpo_invalido(client, token):
+    response = client.post(
+        '/livro/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'ano': 1922, 'titulo': 'Sidarta', 'romancista_id': 1},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_cria_livros_em_lote_muito_grande(client, token, monkeypatch):
+    monkeypatch.setattr('madr.routers.livro.settings.LIVRO_BULK_MAX_ITEMS', 1)
+
+    response = client.post(
+        '/livro/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json=[{}, {}],
+    )
+
+    assert response.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+
+
+@pytest.mark.asyncio
+async def test_exporta_livros_ndjson(client, session, romancista, monkeypatch):
+    monkeypatch.setattr('madr.export.settings.EXPORT_CHUNK_SIZE', 10)
+    session.add_all([
+        Livro(ano=1900 + i, titulo=f'livro {i}', romancista_id=romancista.id)
+        for i in range(25)
+    ])
+    await session.commit()
+
+    response = client.get('/livro/export')
+    linhas = [json.loads(linha) for linha in response.text.splitlines()]
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    assert [linha['titulo'] for linha in linhas] == [
+        f'livro {i}' for i in range(25)
+    ]
+    assert linhas[0] == {
+        'id': 1,
+        'ano': 1900,
+        'titulo': 'livro 0',
+        'romancista_id': 1,
+    }
+
+
+async def _pico_de_memoria_exportando(session, formato: str) -> int:
+    response = export_response(
+        session, select(*LIVRO_COLUMNS), formato, 'livros'
+    )
+
+    tracemalloc.start()
+    async for _ in response.body_iterator:
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return peak
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('formato', ['ndjson', 'csv'])
+async def test_exporta_livros_memoria_constante(
+    session, romancista, monkeypatch, formato
+):
+    monkeypatch.setattr('madr.export.settings.EXPORT_CHUNK_SIZE', 100)
+    await session.execute(
+        insert(Livro),
+        [
+            {'ano': 1900, 'titulo': f'livro {i}', 'romancista_id': 1}
+            for i in range(2_000)
+        ],
+    )
+    await session.commit()
+    await _pico_de_memoria_exportando(session, formato)
+    pequeno = await _pico_de_memoria_exportando(session, formato)
+
+    await session.execute(
+        insert(Livro),
+        [
+            {'ano': 1900, 'titulo': f'livro {i}', 'romancista_id': 1}
+            for i in range(2_000, 20_000)
+        ],
+    )
+    await session.commit()
+    grande = await _pico_de_memoria_exportando(session, formato)
+
+    assert grande < pequeno * 2
+
+
+def test_exporta_livros_csv(client, livro):
+    response = client.get('/livro/export?formato=csv')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'].startswith('text/csv')
+    assert response.text.splitlines() == [
+        'id,ano,titulo,romancista_id',
+        '1,1927,o lobo da estepe,1',
+    ]
+
+
+def test_retorna_livro_not_modified(client, livro):
+    etag = client.get('/livro/1').headers['ETag']
+
+    response = client.get('/livro/1', headers={'If-None-Match': etag})
+
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers['ETag'] == etag
+    assert not response.content
+
+
+def test_retorna_livro_etag_muda_apos_atualizacao(client, livro, token):
+    etag = client.get('/livro/1').headers['ETag']
+
+    client.patch(
+        '/livro/1',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'ano': 1927, 'titulo': 'Steppenwolf', 'romancista_id': 1},
+    )
+    response = client.get('/livro/1', headers={'If-None-Match': etag})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['ETag'] != etag
+
+
+def test_retorna_livros_not_modified(client, livro, romancista):
+    etag = client.get('/livro/').headers['ETag']
+
+    response = client.get('/livro/', headers={'If-None-Match': etag})
+
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_cria_livro_numero_de_consultas(client, token, romancista, queries):
+    with queries:
+        client.post(
+            '/livro/',
+            headers={'Authorization': f'Bearer {token}'},
+            json={'ano': 1922, 'titulo': 'Sidarta', 'romancista_id': 1},
+        )
+
+    assert queries.count == CONSULTAS_POR_ESCRITA + CONSULTAS_DE_ESTATISTICAS
+
+
+def test_atualiza_livro_numero_de_consultas(client, livro, token, queries):
+    with queries:
+        response = client.patch(
+            '/livro/1',
+            headers={'Authorization': f'Bearer {token}'},
+            json={'ano': 1927, 'titulo': 'Steppenwolf', 'romancista_id': 1},
+        )
+
+    # + a leitura com FOR UPDATE de ano e romancista_id para as estatísticas
+    assert response.json()['titulo'] == 'steppenwolf'
+    assert queries.count == CONSULTAS_POR_ESCRITA + 1
+
+
+def test_deleta_livro_numero_de_consultas(client, livro, token, queries):
+    with queries:
+        client.delete('/livro/1', headers={'Authorization': f'Bearer {token}'})
+
+    assert queries.count == CONSULTAS_POR_ESCRITA + CONSULTAS_DE_ESTATISTICAS
+
+
+@pytest.mark.asyncio
+async def test_retorna_livros_por_ids(client, session, romancista, queries):
+    session.add_all([
+        Livro(ano=1900 + i, titulo=f'livro {i}', romancista_id=romancista.id)
+        for i in range(5)
+    ])
+    await session.commit()
+
+    with queries:
+        response = client.get('/livro/?ids=4,99,1,4,2')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'livros': [
+            {'id': 4, 'ano': 1903, 'titulo': 'livro 3', 'romancista_id': 1},
+            {'id': 1, 'ano': 1900, 'titulo': 'livro 0', 'romancista_id': 1},
+            {'id': 2, 'ano': 1901, 'titulo': 'livro 1', 'romancista_id': 1},
+        ],
+        'ausentes': [99],
+    }
+    assert queries.count == 1
+
+
+@pytest.mark.parametrize('ids', ['1,a', '0', '1,2147483648', '99999999999'])
+def test_retorna_livros_por_ids_invalidos(client, ids):
+    response = client.get(f'/livro/?ids={ids}')
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.parametrize(
+    'filtro', ['titulo=lobo', 'ano=1927', 'limit=5', 'offset=1', 'cursor=x']
+)
+def test_retorna_livros_por_ids_com_outros_filtros(client, filtro):
+    response = client.get(f'/livro/?ids=1&{filtro}')
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert 'ids não combina com' in response.json()['detail'][0]['msg']
+
+
+@pytest.mark.parametrize('ids', [[0], [2**31]])
+def test_retorna_livros_em_lote_ids_fora_do_intervalo(client, ids):
+    response = client.post('/livro/batch', json={'ids': ids})
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_retorna_livros_em_lote_expandidos(client, livro, romancista):
+    response = client.post(
+        '/livro/batch?expand=romancista', json={'ids': [2, livro.id]}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'livros': [
+            {
+                'id': livro.id,
+                'ano': 1927,
+                'titulo': 'o lobo da estepe',
+                'romancista_id': romancista.id,
+                'romancista': {'id': romancista.id, 'nome': 'hermann hesse'},
+            }
+        ],
+        'ausentes': [2],
+    }
+
+
+@pytest.mark.asyncio
+async def test_retorna_livros_em_lote_ndjson(
+    client, session, romancista, monkeypatch
+):
+    monkeypatch.setattr('madr.export.settings.EXPORT_CHUNK_SIZE', 2)
+    session.add_all([
+        Livro(ano=1900 + i, titulo=f'livro {i}', romancista_id=romancista.id)
+        for i in range(5)
+    ])
+    await session.commit()
+
+    response = client.post(
+        '/livro/batch',
+        headers={'Accept': 'application/x-ndjson'},
+        json={'ids': [5, 3, 1, 7, 2, 4]},
+    )
+    linhas = [json.loads(linha) for linha in response.text.splitlines()]
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    assert [linha['id'] for linha in linhas[:-1]] == [5, 3, 1, 2, 4]
+    assert linhas[-1] == {'ausentes': [7]}
+    assert (
+        response.headers['ETag']
+        == client.post(
+            '/livro/batch', json={'ids': [5, 3, 1, 7, 2, 4]}
+        ).headers['ETag']
+    )
+
+
+def test_retorna_livros_por_ids_ndjson_sem_modificacao(client, livro):
+    ndjson = {'Accept': 'application/x-ndjson'}
+    response = client.get(f'/livro/?ids={livro.id}', headers=ndjson)
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.text.splitlines()[0] == json.dumps({
+        'id': livro.id,
+        'ano': livro.ano,
+        'titulo': livro.titulo,
+        'romancista_id': livro.romancista_id,
+    })
+
+    response = client.get(
+        f'/livro/?ids={livro.id}',
+        headers=ndjson | {'If-None-Match': response.headers['ETag']},
+    )
+
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_retorna_livros_em_lote_muito_grande(client, monkeypatch):
+    monkeypatch.setattr('madr.routers.livro.settings.BATCH_MAX_IDS', 1)
+
+    response = client.post('/livro/batch', json={'ids': [1, 2]})
+
+    assert response.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    assert response.json() == {'detail': 'Máximo de 1 ids por lote.'}
@@ -0,0 +1,110 @@
+import json
+import os
+import subprocess
+import sys
+from http import HTTPStatus
+
+from madr.metrics import Counter, Gauge, Histogram, Registry, http_requests
+
+
+def test_registry_render_counter_e_gauge():
+    registry = Registry()
+    requests = registry.register(
+        Counter('requests_total', 'Requisições.', ('route',))
+    )
+    in_flight = registry.register(Gauge('in_flight', 'Em andamento.'))
+
+    requests.inc('/livro/')
+    requests.inc('/livro/')
+    in_flight.inc()
+
+    assert registry.render().splitlines() == [
+        '# HELP requests_total Requisições.',
+        '# TYPE requests_total counter',
+        'requests_total{route="/livro/"} 2.0',
+        '# HELP in_flight Em andamento.',
+        '# TYPE in_flight gauge',
+        'in_flight 1.0',
+    ]
+
+
+def test_registry_render_histogram():
+    registry = Registry()
+    duration = registry.register(
+        Histogram('duration_seconds', 'Duração.', buckets=(0.1, 1.0))
+    )
+
+    duration.observe(0.05)
+    duration.observe(0.5)
+    duration.observe(5)
+
+    assert registry.render().splitlines()[2:] == [
+        'duration_seconds_bucket{le="0.1"} 1',
+        'duration_seconds_bucket{le="1.0"} 2',
+        'duration_seconds_bucket{le="+Inf"} 3',
+        'duration_seconds_sum 5.55',
+        'duration_seconds_count 3',
+    ]
+
+
+def test_registry_agrega_snapshots_de_workers(tmp_path):
+    registry = Registry(str(tmp_path))
+    requests = registry.register(Counter('requests_total', 'Requisições.'))
+    requests.inc()
+
+    outro_worker = {'requests_total': {json.dumps([]): 4.0}}
+    (tmp_path / f'{os.getppid()}.json').write_text(json.dumps(outro_worker))
+
+    assert 'requests_total 5.0' in registry.render()
+
+    registry.remove_snapshot()
+
+    assert [path.name for path in tmp_path.iterdir()] == [
+        f'{os.getppid()}.json'
+    ]
+
+
+def test_registry_descarta_snapshots_de_workers_mortos(tmp_path):
+    registry = Registry(str(tmp_path))
+    requests = registry.register(Counter('requests_total', 'Requisições.'))
+    requests.inc()
+
+    morto = subprocess.Popen([sys.executable, '-c', 'pass'])
+    morto.wait()
+    worker_morto = {'requests_total': {json.dumps([]): 4.0}}
+    (tmp_path / f'{morto.pid}.json').write_text(json.dumps(worker_morto))
+
+    assert 'requests_total 1.0' in registry.render()
+    assert not (tmp_path / f'{morto.pid}.json').exists()
+
+
+def test_metricas_acumuladas_sao_counters(client):
+    texto = client.get('/metrics').text
+
+    assert '# TYPE madr_db_pool_wait_seconds_total counter' in texto
+    assert '# TYPE madr_entity_cache_lookups_total counter' in texto
+
+
+def test_metricas_desligadas_nao_registram_requisicoes(
+    client, livro, monkeypatch
+):
+    monkeypatch.setattr('madr.app.settings.METRICS_ENABLED', False)
+    antes = http_requests.value('GET', '/livro/{livro_id}', 200)
+
+    client.get('/livro/1')
+
+    assert http_requests.value('GET', '/livro/{livro_id}', 200) == antes
+
+
+def test_retorna_metricas(client, livro):
+    client.get('/livro/1')
+
+    response = client.get('/metrics')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'].startswith('text/plain')
+    assert (
+        'madr_http_requests_total{method="GET",route="/livro/{livro_id}",'
+        'status="200"}'
+    ) in response.text
+    assert 'madr_db_pool_connections{state="checked_out"}' in response.text
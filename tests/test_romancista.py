@@ -1,7 +1,20 @@
+import asyncio
+import json
 from http import HTTPStatus
 
 import pytest
-from sqlalchemy.exc import IntegrityError
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.cache import entity_cache
+from madr.models import Livro, Romancista
+from madr.routers.romancista import cria_romancista
+from madr.schemas import RomancistaSchema
+from madr.security import ContaPrincipal
+
+# verificação de token_version + o próprio comando de escrita
+CONSULTAS_POR_ESCRITA = 2
 
 
 def test_cria_romancista(client, token):
@@ -18,12 +31,38 @@ def test_cria_romancista(client, token):
 
 
 def test_cria_romancista_conflict(client, romancista, token):
-    with pytest.raises(IntegrityError):
-        client.post(
-            '/romancista',
-            json={'nome': 'Hermann Hesse'},
-            headers={'Authorization': f'Bearer {token}'},
-        )
+    response = client.post(
+        '/romancista',
+        json={'nome': 'Hermann Hesse'},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.CONFLICT
+    assert response.json() == {'detail': 'Romancista já existe.'}
+
+
+@pytest.mark.asyncio
+async def test_cria_romancista_concorrente(engine, session, conta):
+    principal = ContaPrincipal(id=conta.id, email=conta.email)
+
+    async def cria():
+        async with AsyncSession(engine, expire_on_commit=False) as nova:
+            try:
+                await cria_romancista(
+                    RomancistaSchema(nome='Clarice Lispector'),
+                    nova,
+                    principal,
+                )
+            except HTTPException as exc:
+                return exc.status_code
+
+            return HTTPStatus.CREATED
+
+    resultados = await asyncio.gather(*(cria() for _ in range(10)))
+
+    assert (
+        sorted(resultados) == [HTTPStatus.CREATED] + [HTTPStatus.CONFLICT] * 9
+    )
 
 
 def test_retorna_romancista(client, romancista):
@@ -43,16 +82,26 @@ def test_retorna_romancista_por_nome(client, romancista):
 
     assert response.status_code == HTTPStatus.OK
     assert response.json() == {
-        'romancistas': [{'id': 1, 'nome': 'hermann hesse'}]
+        'romancistas': [{'id': 1, 'nome': 'hermann hesse'}],
+        'next_cursor': None,
     }
 
 
+def test_retorna_romancista_por_nome_ignora_caixa(client, romancista):
+    response = client.get('/romancista/?romancista_nome=HESSE')
+
+    assert response.json()['romancistas'] == [
+        {'id': 1, 'nome': 'hermann hesse'}
+    ]
+
+
 def test_retorna_romancista_sem_nome(client, romancista):
     response = client.get('/romancista/')
 
     assert response.status_code == HTTPStatus.OK
     assert response.json() == {
-        'romancistas': [{'id': 1, 'nome': 'hermann hesse'}]
+        'romancistas': [{'id': 1, 'nome': 'hermann hesse'}],
+        'next_cursor': None,
     }
 
 
@@ -66,6 +115,71 @@ def test_deleta_romancista(client, romancista, token):
     assert response.json() == {'message': 'Romancista deletada do MADR.'}
 
 
+class ContaChavesDeCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.chaves = []
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    async def hold(self, keys, seconds):
+        self.chaves.extend(keys)
+        await self.backend.hold(keys, seconds)
+
+    async def delete(self, *keys):
+        self.chaves.extend(keys)
+        await self.backend.delete(*keys)
+
+    async def mark(self, key, seconds):
+        self.chaves.append(key)
+        await self.backend.mark(key, seconds)
+
+
+@pytest.fixture
+def conta_chaves_de_cache(monkeypatch):
+    monkeypatch.setattr(
+        entity_cache, 'backend', ContaChavesDeCache(entity_cache.backend)
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('conta_chaves_de_cache')
+@pytest.mark.parametrize('quantidade', [1, 200])
+async def test_deleta_romancista_remove_livros_em_cascata(
+    client, session, token, queries, quantidade
+):
+
+    romancista = Romancista(nome='hermann hesse')
+    session.add(romancista)
+    await session.flush()
+    session.add_all([
+        Livro(
+            ano=1900 + i % 5, titulo=f'livro {i}', romancista_id=romancista.id
+        )
+        for i in range(quantidade)
+    ])
+    await session.commit()
+
+    with queries:
+        response = client.delete(
+            f'/romancista/{romancista.id}',
+            headers={'Authorization': f'Bearer {token}'},
+        )
+
+    restantes = await session.scalar(select(func.count()).select_from(Livro))
+
+    assert response.status_code == HTTPStatus.OK
+    assert restantes == 0
+    # bloqueio da romancista, contagem por ano e ajuste das estatísticas
+    assert queries.count == CONSULTAS_POR_ESCRITA + 4
+    # escrever no cache também não depende do número de livros
+    assert entity_cache.backend.chaves == [
+        f'romancista:{romancista.id}',
+        f'dropped:romancista:{romancista.id}',
+    ]
+
+
 def test_deleta_romancista_not_found(client, token):
     response = client.delete(
         '/romancista/1',
@@ -96,3 +210,232 @@ def test_atualiza_romancista_not_found(client, token):
 
     assert response.status_code == HTTPStatus.NOT_FOUND
     assert response.json() == {'detail': 'Romancista não encontrada no MADR.'}
+
+
+@pytest.mark.asyncio
+async def test_retorna_romancista_por_cursor(client, session):
+    session.add_all([Romancista(nome=nome) for nome in ('a', 'b', 'c')])
+    await session.commit()
+
+    primeira = client.get('/romancista/?limit=2').json()
+    segunda = client.get(
+        f'/romancista/?limit=2&cursor={primeira["next_cursor"]}'
+    ).json()
+
+    assert [r['nome'] for r in primeira['romancistas']] == ['a', 'b']
+    assert segunda == {
+        'romancistas': [{'id': 3, 'nome': 'c'}],
+        'next_cursor': None,
+    }
+
+
+def test_leituras_nao_carregam_entidades(client, session, romancista):
+    session.expunge_all()
+
+    client.get(f'/romancista/{romancista.id}')
+    client.get('/romancista/')
+
+    assert len(session.identity_map) == 0
+
+
+def test_retorna_romancistas_json_rapido(client, romancista, monkeypatch):
+    padrao = client.get('/romancista/?limit=1')
+    monkeypatch.setattr('madr.routers.romancista.settings.FAST_JSON', True)
+    rapido = client.get('/romancista/?limit=1')
+
+    assert rapido.status_code == HTTPStatus.OK
+    assert rapido.json() == padrao.json()
+    assert rapido.headers['ETag'] == padrao.headers['ETag']
+
+
+def test_retorna_romancistas_com_totais(client, token, romancista):
+    for ano, titulo in ((1919, 'demian'), (1927, 'o lobo da estepe')):
+        client.post(
+            '/livro/',
+            headers={'Authorization': f'Bearer {token}'},
+            json={
+                'ano': ano,
+                'titulo': titulo,
+                'romancista_id': romancista.id,
+            },
+        )
+    client.post(
+        '/romancista/',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'nome': 'clarice lispector'},
+    )
+
+    response = client.get('/romancista/?totais=true')
+
+    assert response.json()['romancistas'] == [
+        {
+            'id': romancista.id,
+            'nome': 'hermann hesse',
+            'total_livros': 2,
+            'primeiro_ano': 1919,
+            'ultimo_ano': 1927,
+        },
+        {
+            'id': romancista.id + 1,
+            'nome': 'clarice lispector',
+            'total_livros': 0,
+            'primeiro_ano': None,
+            'ultimo_ano': None,
+        },
+    ]
+    assert (
+        'total_livros'
+        not in client.get('/romancista/').json()['romancistas'][0]
+    )
+
+
+def test_retorna_romancistas_com_totais_numero_de_consultas(
+    client, romancista, queries
+):
+    with queries:
+        client.get('/romancista/?totais=true')
+
+    assert queries.count == 1
+
+
+def test_retorna_romancistas_com_totais_etag_muda(client, token, romancista):
+    antes = client.get('/romancista/?totais=true')
+    client.post(
+        '/livro/',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'ano': 1919, 'titulo': 'demian', 'romancista_id': romancista.id},
+    )
+    depois = client.get(
+        '/romancista/?totais=true',
+        headers={'If-None-Match': antes.headers['ETag']},
+    )
+
+    assert depois.status_code == HTTPStatus.OK
+
+
+def test_retorna_romancista_cursor_invalido(client):
+    response = client.get('/romancista/?cursor=invalido')
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json() == {'detail': 'Cursor inválido.'}
+
+
+def test_exporta_romancistas(client, romancista):
+    response = client.get('/romancista/export')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {'id': 1, 'nome': 'hermann hesse'}
+
+
+def test_exporta_romancistas_csv(client, romancista):
+    response = client.get('/romancista/export?formato=csv')
+
+    assert response.text.splitlines() == ['id,nome', '1,hermann hesse']
+
+
+def test_retorna_romancista_not_modified(client, romancista):
+    etag = client.get('/romancista/1').headers['ETag']
+
+    response = client.get('/romancista/1', headers={'If-None-Match': etag})
+
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_retorna_romancistas_etag_muda_apos_atualizacao(
+    client, romancista, token
+):
+    etag = client.get('/romancista/').headers['ETag']
+
+    client.patch(
+        '/romancista/1',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'nome': 'Hermann Hessee'},
+    )
+    response = client.get('/romancista/', headers={'If-None-Match': etag})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['ETag'] != etag
+
+
+def test_atualiza_romancista_numero_de_consultas(
+    client, romancista, token, queries
+):
+    with queries:
+        client.patch(
+            '/romancista/1',
+            headers={'Authorization': f'Bearer {token}'},
+            json={'nome': 'Hermann Hessee'},
+        )
+
+    assert queries.count == CONSULTAS_POR_ESCRITA
+
+
+@pytest.mark.asyncio
+async def test_retorna_romancistas_em_lote(client, session, queries):
+    session.add_all([Romancista(nome=f'romancista {i}') for i in range(3)])
+    await session.commit()
+
+    with queries:
+        response = client.post('/romancista/batch', json={'ids': [3, 8, 1, 3]})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'romancistas': [
+            {'id': 3, 'nome': 'romancista 2'},
+            {'id': 1, 'nome': 'romancista 0'},
+        ],
+        'ausentes': [8],
+    }
+    assert queries.count == 1
+
+
+def test_retorna_romancistas_em_lote_vazio(client):
+    response = client.post('/romancista/batch', json={'ids': []})
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_retorna_romancistas_em_lote_ndjson(
+    client, session, monkeypatch
+):
+    monkeypatch.setattr('madr.export.settings.EXPORT_CHUNK_SIZE', 2)
+    session.add_all([Romancista(nome=f'romancista {i}') for i in range(4)])
+    await session.commit()
+    lote = {'ids': [4, 9, 2, 1]}
+
+    response = client.post(
+        '/romancista/batch?totais=true',
+        headers={'Accept': 'application/x-ndjson'},
+        json=lote,
+    )
+    linhas = [json.loads(linha) for linha in response.text.splitlines()]
+
+    assert response.status_code == HTTPStatus.OK
+    assert [linha['id'] for linha in linhas[:-1]] == [4, 2, 1]
+    assert linhas[0] == {
+        'id': 4,
+        'nome': 'romancista 3',
+        'total_livros': 0,
+        'primeiro_ano': None,
+        'ultimo_ano': None,
+    }
+    assert linhas[-1] == {'ausentes': [9]}
+    assert (
+        response.headers['ETag']
+        == client.post('/romancista/batch?totais=true', json=lote).headers[
+            'ETag'
+        ]
+    )
+
+
+def test_retorna_romancistas_em_lote_muito_grande(client, monkeypatch):
+    monkeypatch.setattr('madr.routers.romancista.settings.BATCH_MAX_IDS', 1)
+
+    response = client.post(
+        '/romancista/batch',
+        headers={'Accept': 'application/x-ndjson'},
+        json={'ids': [1, 2]},
+    )
+
+    assert response.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
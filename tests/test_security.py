@@ -1,13 +1,20 @@
 from http import HTTPStatus
 
 import pytest
+from fastapi import HTTPException
 from jwt import DecodeError, decode
 
 from madr.security import (
+    ContaPrincipal,
+    clear_token_versions,
     create_access_token,
+    create_conta_token,
+    get_current_principal,
     get_password_hash,
+    get_password_hash_async,
     settings,
     verify_password,
+    verify_password_async,
 )
 
 
@@ -46,3 +53,65 @@ def test_jwt_decode_error():
 def test_password():
     hashed = get_password_hash('test')
     assert verify_password('test', hashed)
+
+
+@pytest.mark.asyncio
+async def test_password_async():
+    hashed = await get_password_hash_async('test')
+
+    assert await verify_password_async('test', hashed)
+    assert not await verify_password_async('errado', hashed)
+
+
+@pytest.mark.asyncio
+async def test_password_async_fila_cheia(monkeypatch):
+    monkeypatch.setattr(settings, 'HASH_MAX_PENDING', 0)
+
+    with pytest.raises(HTTPException) as exc:
+        await get_password_hash_async('test')
+
+    assert exc.value.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+
+
+def test_token_sem_versao_nao_autentica(client, conta):
+    token = create_access_token({'sub': conta.email})
+
+    response = client.post(
+        '/romancista/',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'nome': 'Roberto Bolaño'},
+    )
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_get_current_principal_usa_cache(session, conta, monkeypatch):
+    token = create_conta_token(conta)
+    principal = await get_current_principal(session, token)
+
+    async def falha(*args, **kwargs):
+        raise AssertionError('consulta inesperada')
+
+    monkeypatch.setattr(session, 'scalar', falha)
+
+    assert await get_current_principal(session, token) == principal
+    assert principal == ContaPrincipal(id=conta.id, email=conta.email)
+
+    clear_token_versions()
+
+
+def test_decode_token_usa_cache(client, conta, token, monkeypatch):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post('/romancista/', headers=headers, json={'nome': 'Bolaño'})
+
+    def falha(*args, **kwargs):
+        raise AssertionError('decode inesperado')
+
+    monkeypatch.setattr('madr.security.decode', falha)
+
+    response = client.post(
+        '/romancista/', headers=headers, json={'nome': 'Saramago'}
+    )
+
+    assert response.status_code == HTTPStatus.CREATED
@@ -0,0 +1,49 @@
+import pytest
+
+from madr.server import server_options
+from madr.settings import Settings
+
+
+def test_server_options_le_settings(monkeypatch):
+    monkeypatch.setenv('SERVER_WORKERS', '4')
+    monkeypatch.setenv('CACHE_URL', 'redis://cache:6379/0')
+    monkeypatch.setenv('METRICS_DIR', '/tmp/madr_metrics')
+    monkeypatch.setenv('SERVER_LOOP', 'uvloop')
+    monkeypatch.setenv('SERVER_MAX_REQUESTS', '10000')
+
+    options = server_options(Settings())  # type: ignore
+
+    assert [
+        options['workers'],
+        options['loop'],
+        options['limit_max_requests'],
+        options['limit_concurrency'],
+    ] == [4, 'uvloop', 10_000, None]
+
+
+def test_server_options_recusa_workers_com_cache_em_memoria(monkeypatch):
+    monkeypatch.setenv('SERVER_WORKERS', '4')
+    monkeypatch.setenv('METRICS_DIR', '/tmp/madr_metrics')
+    monkeypatch.delenv('CACHE_URL', raising=False)
+
+    with pytest.raises(ValueError, match='CACHE_URL'):
+        server_options(Settings())  # type: ignore
+
+    monkeypatch.setenv('CACHE_SIZE', '0')
+    settings = Settings()  # type: ignore
+
+    assert server_options(settings)['workers'] == settings.SERVER_WORKERS
+
+
+def test_server_options_recusa_workers_sem_metrics_dir(monkeypatch):
+    monkeypatch.setenv('SERVER_WORKERS', '4')
+    monkeypatch.setenv('CACHE_URL', 'redis://cache:6379/0')
+    monkeypatch.delenv('METRICS_DIR', raising=False)
+
+    with pytest.raises(ValueError, match='METRICS_DIR'):
+        server_options(Settings())  # type: ignore
+
+    monkeypatch.setenv('METRICS_ENABLED', 'false')
+    settings = Settings()  # type: ignore
+
+    assert server_options(settings)['workers'] == settings.SERVER_WORKERS
@@ -0,0 +1,146 @@
+import asyncio
+from http import HTTPStatus
+
+import httpx
+import pytest
+from fastapi import HTTPException, Request
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.app import app
+from madr.database import PRIMARY_COOKIE, get_read_engine
+from madr.metrics import singleflight_calls
+from madr.singleflight import SingleFlight
+
+RAJADA = 500
+
+
+async def _libera_quando_coalescidas(kind, antes, quantidade, liberado):
+    while singleflight_calls.value(kind, 'collapsed') - antes < quantidade:
+        await asyncio.sleep(0)
+    liberado.set()
+
+
+@pytest.mark.asyncio
+async def test_singleflight_executa_uma_vez():
+    singleflight = SingleFlight()
+    liberado = asyncio.Event()
+    chamadas = []
+
+    async def consulta():
+        chamadas.append(1)
+        await liberado.wait()
+        return {'id': 1}
+
+    antes = singleflight_calls.value('teste', 'collapsed')
+    asyncio.ensure_future(
+        _libera_quando_coalescidas('teste', antes, RAJADA - 1, liberado)
+    )
+    resultados = await asyncio.gather(
+        *(singleflight.do('teste', 1, consulta) for _ in range(RAJADA))
+    )
+
+    assert chamadas == [1]
+    assert resultados == [{'id': 1}] * RAJADA
+    assert singleflight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_singleflight_compartilha_excecao():
+    singleflight = SingleFlight()
+
+    async def consulta():
+        await asyncio.sleep(0)
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND)
+
+    resultados = await asyncio.gather(
+        *(singleflight.do('teste', 2, consulta) for _ in range(3)),
+        return_exceptions=True,
+    )
+
+    assert [exc.status_code for exc in resultados] == [
+        HTTPStatus.NOT_FOUND
+    ] * 3
+    assert singleflight.in_flight() == 0
+
+
+def _sessao_lenta(liberado):
+    class SessaoLenta(AsyncSession):
+        async def execute(self, *args, **kwargs):
+            await liberado.wait()
+            return await super().execute(*args, **kwargs)
+
+    return SessaoLenta
+
+
+@pytest.mark.asyncio
+async def test_rajada_identica_usa_uma_conexao(
+    engine, session, livro, monkeypatch
+):
+    liberado = asyncio.Event()
+    checkouts = []
+
+    def registra_checkout(*args):
+        checkouts.append(1)
+
+    monkeypatch.setattr('madr.database.AsyncSession', _sessao_lenta(liberado))
+    app.dependency_overrides[get_read_engine] = lambda: engine
+    event.listen(engine.sync_engine, 'checkout', registra_checkout)
+    antes = singleflight_calls.value('livros', 'collapsed')
+    asyncio.ensure_future(
+        _libera_quando_coalescidas('livros', antes, RAJADA - 1, liberado)
+    )
+
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url='http://madr'
+        ) as client:
+            respostas = await asyncio.gather(
+                *(client.get('/livro/?titulo=lobo') for _ in range(RAJADA))
+            )
+    finally:
+        event.remove(engine.sync_engine, 'checkout', registra_checkout)
+        app.dependency_overrides.clear()
+
+    assert {resposta.status_code for resposta in respostas} == {HTTPStatus.OK}
+    assert respostas[-1].json()['livros'][0]['titulo'] == 'o lobo da estepe'
+    assert len(checkouts) == 1
+
+
+@pytest.mark.asyncio
+async def test_leitura_no_primario_nao_usa_resultado_da_replica(
+    engine, session, livro, monkeypatch
+):
+    liberado = asyncio.Event()
+    # Mesmo banco, mas outro engine, como uma réplica seria.
+    replica = engine.execution_options(madr_replica=True)
+
+    def get_read_engine_override(request: Request):
+        return engine if request.cookies.get(PRIMARY_COOKIE) else replica
+
+    monkeypatch.setattr('madr.database.AsyncSession', _sessao_lenta(liberado))
+    app.dependency_overrides[get_read_engine] = get_read_engine_override
+    lideres = singleflight_calls.value('livro', 'leader')
+    coalescidas = singleflight_calls.value('livro', 'collapsed')
+    asyncio.get_running_loop().call_later(0.1, liberado.set)
+
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url='http://madr'
+        ) as client:
+            respostas = await asyncio.gather(
+                client.get(f'/livro/{livro.id}'),
+                client.get(
+                    f'/livro/{livro.id}', cookies={PRIMARY_COOKIE: '1'}
+                ),
+            )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert [resposta.status_code for resposta in respostas] == [
+        HTTPStatus.OK
+    ] * 2
+    assert (
+        singleflight_calls.value('livro', 'leader') - lideres,
+        singleflight_calls.value('livro', 'collapsed') - coalescidas,
+    ) == (2, 0)
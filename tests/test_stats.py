@@ -0,0 +1,110 @@
+from http import HTTPStatus
+
+import pytest
+
+from madr.stats import recalcula_estatisticas
+
+
+def _cria_livro(client, token, titulo, ano, romancista_id):
+    return client.post(
+        '/livro/',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'ano': ano, 'titulo': titulo, 'romancista_id': romancista_id},
+    ).json()
+
+
+def test_stats_catalogo_vazio(client):
+    response = client.get('/stats')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {'livros': 0, 'romancistas': 0}
+
+
+def test_stats_acompanha_criacao_de_livros(client, token, romancista):
+    _cria_livro(client, token, 'demian', 1919, romancista.id)
+    _cria_livro(client, token, 'sidarta', 1922, romancista.id)
+    _cria_livro(client, token, 'o lobo da estepe', 1927, romancista.id)
+
+    assert client.get('/stats').json() == {'livros': 3, 'romancistas': 1}
+    assert client.get('/stats/anos').json() == {
+        'anos': [
+            {'ano': 1919, 'total': 1},
+            {'ano': 1922, 'total': 1},
+            {'ano': 1927, 'total': 1},
+        ]
+    }
+    assert client.get(f'/stats/romancistas/{romancista.id}').json() == {
+        'romancista_id': romancista.id,
+        'total': 3,
+    }
+
+
+def test_stats_acompanha_lote(client, token, romancista):
+    client.post(
+        '/livro/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json=[
+            {'ano': 1919, 'titulo': 'demian', 'romancista_id': romancista.id},
+            {'ano': 1919, 'titulo': 'klein', 'romancista_id': romancista.id},
+            {'ano': 1919, 'titulo': 'demian', 'romancista_id': romancista.id},
+        ],
+    )
+
+    assert client.get('/stats/anos').json() == {
+        'anos': [{'ano': 1919, 'total': 2}]
+    }
+
+
+def test_stats_acompanha_atualizacao(client, token, romancista):
+    livro = _cria_livro(client, token, 'demian', 1918, romancista.id)
+
+    client.patch(
+        f'/livro/{livro["id"]}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'ano': 1919, 'titulo': 'demian', 'romancista_id': romancista.id},
+    )
+
+    assert client.get('/stats/anos').json() == {
+        'anos': [{'ano': 1919, 'total': 1}]
+    }
+    assert client.get('/stats').json()['livros'] == 1
+
+
+def test_stats_acompanha_remocoes(client, token):
+    romancista = client.post(
+        '/romancista/',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'nome': 'hermann hesse'},
+    ).json()
+    livro = _cria_livro(client, token, 'demian', 1919, romancista['id'])
+    _cria_livro(client, token, 'sidarta', 1922, romancista['id'])
+
+    assert client.get('/stats').json() == {'livros': 2, 'romancistas': 1}
+
+    client.delete(
+        f'/livro/{livro["id"]}', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert client.get('/stats/anos').json() == {
+        'anos': [{'ano': 1922, 'total': 1}]
+    }
+
+    client.delete(
+        f'/romancista/{romancista["id"]}',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert client.get('/stats').json() == {'livros': 0, 'romancistas': 0}
+    assert client.get('/stats/anos').json() == {'anos': []}
+    assert client.get('/stats/romancistas').json() == {'romancistas': []}
+
+
+@pytest.mark.asyncio
+async def test_recalcula_estatisticas(client, session, livro):
+    await recalcula_estatisticas(await session.connection())
+    await session.commit()
+
+    assert client.get('/stats').json() == {'livros': 1, 'romancistas': 1}
+    assert client.get('/stats/romancistas').json() == {
+        'romancistas': [{'romancista_id': livro.romancista_id, 'total': 1}]
+    }